@@ -0,0 +1,156 @@
+"""Conciliação em lote, sem interface gráfica.
+
+Exemplos:
+    python conciliar_lote.py mecflu --periodo 2025-06 --conta-corrente 10201
+    python conciliar_lote.py mecflu --extrato banco_brasil="Extrato BB.pdf" --relatorio SAIDA="Contas Pagas.csv"
+    python conciliar_lote.py --todas --periodo 2025-06 --saida resultados/
+
+Sem --extrato/--relatorio, os arquivos são lidos da pasta_extratos da empresa em config/empresas.json.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+
+from services.config import recurso_path
+from services.pipeline import BANCOS, RESULTADOS, SessaoConciliacao, listar_arquivos_empresa
+from services.saida import ESCRITORES, FORMATO_PADRAO
+from services.pareamento import TOLERANCIA_DIAS
+from services.rastreamento import rastrear
+
+
+def _par_chave_valor(texto, chaves_validas=None):
+    chave, sep, valor = texto.partition("=")
+    if not sep:
+        return None, texto
+    chave = chave.strip()
+    if chaves_validas and chave not in chaves_validas:
+        raise argparse.ArgumentTypeError(f"'{chave}' inválido, use um de: {', '.join(chaves_validas)}")
+    return chave, valor
+
+
+def conciliar_empresa(id_empresa, config, args):
+    inicio = time.perf_counter()
+    sessao = SessaoConciliacao(id_empresa, config=config)
+    conta_corrente = args.conta_corrente or config.get("conta_corrente", "")
+
+    if args.extrato or args.relatorio:
+        extratos = [_par_chave_valor(e, BANCOS) for e in args.extrato]
+        relatorios = [_par_chave_valor(r, ["SAIDA", "ENTRADA"]) for r in args.relatorio]
+    else:
+        extratos, relatorios = listar_arquivos_empresa(recurso_path(config["pasta_extratos"]))
+
+    a_importar = []
+    for tipo, caminho in relatorios:
+        # Empresas com relatório único (imperio) separam entradas e saídas sozinhas
+        tipo = None if sessao.nome_parser_empresa == "imperio" else tipo
+        if sessao.nome_parser_empresa != "imperio" and tipo is None:
+            print(f"  relatório sem tipo (SAIDA/ENTRADA), ignorado: {os.path.basename(caminho)}")
+            continue
+        a_importar.append((tipo, caminho))
+
+    def mostrar(concluidos, total, situacao):
+        origem = "extrato" if situacao["origem"] == "extrato" else "relatório"
+        rotulo = situacao["chave"] or "automático"
+        detalhe = f"ERRO: {situacao['erro']}" if situacao["erro"] else f"{situacao['linhas']} linhas"
+        print(f"  [{concluidos}/{total}] {origem} {rotulo}: {situacao['arquivo']} ({detalhe})")
+
+    situacoes = sessao.importar_arquivos(a_importar, extratos, conta_corrente=conta_corrente, ao_progredir=mostrar)
+    erros = [s for s in situacoes if s["erro"]]
+    if erros:
+        print(f"  {len(erros)} arquivo(s) com erro não entraram na conciliação")
+
+    if not len(sessao.extratos):
+        raise ValueError("Nenhum extrato bancário com lançamentos.")
+    if not sessao.tem_relatorios():
+        raise ValueError("Nenhum relatório da empresa com lançamentos.")
+    if args.resumo_diario:
+        print(sessao.resumo_diario(args.periodo).to_string(index=False))
+
+    linhas = len(sessao.extratos) + len(sessao.lancamentos)
+    gerados = sessao.processar(
+        config["nome"],
+        conta_corrente=conta_corrente,
+        periodo=args.periodo,
+        pasta_destino=args.saida,
+        incluir_data=not args.sem_data,
+        tolerancia_dias=args.tolerancia_dias,
+        defasagem_transferencias=1 if args.transferencia_dia_util_seguinte else 0,
+        formato=args.formato,
+        formatos=dict(_par_chave_valor(f, RESULTADOS) for f in args.formato_resultado)
+    )
+    duracao = time.perf_counter() - inicio
+    for caminhos in gerados.values():
+        for caminho in caminhos:
+            print(f"  gerado: {caminho}")
+    categorias = sessao.contagem_categorias()
+    if categorias:
+        print("  categorias: " + ", ".join(f"{nome} {linhas}" for nome, linhas in categorias.items()))
+    print(f"  {linhas} linhas em {duracao:.2f}s ({linhas / duracao if duracao else 0:.0f} linhas/s)")
+    return linhas, duracao
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conciliação bancária em lote (sem interface gráfica)")
+    parser.add_argument("empresa", nargs="?", help="id da empresa em config/empresas.json")
+    parser.add_argument("--todas", action="store_true", help="processa todas as empresas do config")
+    parser.add_argument("--periodo", help="mês a conciliar, no formato AAAA-MM")
+    parser.add_argument("--conta-corrente", default="", help="conta contábil do banco (ex: 10201)")
+    parser.add_argument("--extrato", action="append", default=[], metavar="[BANCO=]CAMINHO",
+                        help="extrato em PDF (repetível); sem BANCO=, o banco é reconhecido pela primeira página")
+    parser.add_argument("--relatorio", action="append", default=[], metavar="[TIPO=]CAMINHO", help="relatório da empresa (repetível)")
+    parser.add_argument("--saida", help="pasta de destino dos arquivos (padrão: área de trabalho)")
+    parser.add_argument("--config", default=recurso_path("config/empresas.json"), help="arquivo de empresas")
+    parser.add_argument("--tolerancia-dias", type=int, default=TOLERANCIA_DIAS,
+                        help=f"dias de diferença aceitos no pareamento lançamento a lançamento (padrão: {TOLERANCIA_DIAS})")
+    parser.add_argument("--transferencia-dia-util-seguinte", action="store_true",
+                        help="aceita o crédito de uma transferência entre bancos no dia útil seguinte ao débito")
+    parser.add_argument("--formato", choices=list(ESCRITORES), default=FORMATO_PADRAO,
+                        help="formato dos resultados; em xlsx todos vão numa só pasta de trabalho, uma aba cada")
+    parser.add_argument("--formato-resultado", action="append", default=[], metavar="RESULTADO=FORMATO",
+                        help=f"formato de um resultado específico ({', '.join(RESULTADOS)}), repetível")
+    parser.add_argument("--sem-data", action="store_true", help="não acrescenta a data de hoje ao nome dos arquivos")
+    parser.add_argument("--tempos", action="store_true", help="mostra o tempo de cada etapa ao fim de cada empresa")
+    parser.add_argument("--resumo-diario", action="store_true",
+                        help="mostra os débitos e créditos por dia do relatório e de cada banco, antes de processar")
+    args = parser.parse_args(argv)
+
+    if not args.empresa and not args.todas:
+        parser.error("informe o id da empresa ou --todas")
+    if args.todas and (args.extrato or args.relatorio):
+        parser.error("--todas usa a pasta_extratos de cada empresa; não combine com --extrato/--relatorio")
+    if args.saida:
+        os.makedirs(args.saida, exist_ok=True)
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        empresas = json.load(f)
+    ids = list(empresas) if args.todas else [args.empresa]
+
+    falhas = 0
+    total_linhas, total_tempo = 0, 0.0
+    for id_empresa in ids:
+        if id_empresa not in empresas:
+            print(f"[{id_empresa}] empresa não encontrada em {args.config}")
+            falhas += 1
+            continue
+        print(f"[{id_empresa}] {empresas[id_empresa]['nome']}")
+        try:
+            with rastrear(f"lote_{id_empresa}") as rastro:
+                linhas, duracao = conciliar_empresa(id_empresa, empresas[id_empresa], args)
+            total_linhas += linhas
+            total_tempo += duracao
+        except Exception as e:
+            print(f"  ERRO: {e}")
+            falhas += 1
+        if args.tempos:
+            print(rastro.resumo())
+
+    print(f"Concluído: {len(ids) - falhas}/{len(ids)} empresas, {total_linhas} linhas em {total_tempo:.2f}s")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
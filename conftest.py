@@ -0,0 +1 @@
+# Deixa os testes (tests/) importarem services, parsers etc. rodando o pytest da raiz do projeto
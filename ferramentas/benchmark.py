@@ -0,0 +1,258 @@
+"""Benchmark dos parsers sobre os arquivos de exemplo (pasta_extratos de config/empresas.json).
+
+Cada extrato (importar_extrato do banco) e cada relatório (importar_arquivo da empresa) roda
+num processo próprio, para o pico de memória ser só dele. Grava tempo, pico de memória,
+páginas/s e linhas/s em JSON; com --comparar, aponta o que piorou além do limite e sai com 1.
+
+Todo parser de parsers.bancos entra: banco sem extrato de exemplo aparece como "sem amostra"
+(um PDF avulso pode ser passado com --extrato banco=caminho).
+
+Exemplos (da raiz do projeto):
+    python -m ferramentas.benchmark --saida benchmark_base.json
+    python -m ferramentas.benchmark --saida benchmark_novo.json --comparar benchmark_base.json --limite 0.2
+    python -m ferramentas.benchmark --extrato "mercado_pago=C:/extratos/mp 06-2025.pdf"
+"""
+import os
+import sys
+import json
+import time
+import platform
+import inspect
+import argparse
+import tempfile
+import importlib
+import subprocess
+from datetime import datetime
+
+from parsers.bancos.registro import BANCOS
+from services.config import workers_extracao_pdf
+from services.pipeline import listar_arquivos_empresa
+
+# Métricas comparadas entre execuções (maior = pior)
+METRICAS = ["tempo_s", "pico_memoria_mb"]
+LIMITE_PADRAO = 0.2
+# Diferenças abaixo disso não contam como piora (ruído em casos de milissegundos / poucos MB)
+FOLGA = {"tempo_s": 0.05, "pico_memoria_mb": 5.0}
+PREFIXO_RESULTADO = "[BENCHMARK] "
+# Valor dos parâmetros obrigatórios de importar_extrato além do PDF (ex: contas do Mercado Pago)
+CONTA_FICTICIA = "0"
+
+# Os casos rodam com outra pasta de trabalho; os caminhos partem da raiz do projeto
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _caminho(relativo):
+    return os.path.join(RAIZ, relativo)
+
+
+def _pico_memoria_mb():
+    """Pico de memória residente deste processo (e dos filhos já encerrados, ex: extração paralela)"""
+    try:
+        import resource
+    except ImportError:
+        return _pico_memoria_windows()
+    fator = 1024 * 1024 if sys.platform == "darwin" else 1024
+    proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(proprio, filhos) / fator, 1)
+
+
+def _pico_memoria_windows():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class Contadores(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (nome, ctypes.c_size_t) for nome in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage"
+                )
+            ]
+
+        contadores = Contadores()
+        contadores.cb = ctypes.sizeof(contadores)
+        processo = ctypes.windll.kernel32.GetCurrentProcess()
+        ctypes.windll.psapi.GetProcessMemoryInfo(processo, ctypes.byref(contadores), contadores.cb)
+        return round(contadores.PeakWorkingSetSize / (1024 * 1024), 1)
+    except Exception:
+        return None
+
+
+def listar_casos(extratos_avulsos=()):
+    """(nome, tipo, módulo, caminho, tipo do relatório) de cada arquivo das pastas das empresas.
+
+    extratos_avulsos: (banco, caminho) extras. Banco sem nenhum extrato entra com caminho None.
+    """
+    with open(_caminho("config/empresas.json"), encoding="utf-8") as f:
+        empresas = json.load(f)
+
+    casos = []
+    for id_empresa, config in empresas.items():
+        pasta = _caminho(config["pasta_extratos"])
+        if not os.path.isdir(pasta):
+            continue
+        extratos, relatorios = listar_arquivos_empresa(pasta)
+        for banco, caminho in extratos:
+            casos.append((f"{id_empresa}/{os.path.basename(caminho)}", "extrato", banco, caminho, None))
+        for tipo, caminho in relatorios:
+            casos.append((f"{id_empresa}/{os.path.basename(caminho)}", "relatorio", config["parser"], caminho, tipo))
+    for banco, caminho in extratos_avulsos:
+        casos.append((f"avulso/{os.path.basename(caminho)}", "extrato", banco, os.path.abspath(caminho), None))
+
+    com_amostra = {modulo for _, tipo, modulo, _, _ in casos if tipo == "extrato"}
+    casos += [(f"sem amostra/{banco}", "extrato", banco, None, None) for banco in BANCOS if banco not in com_amostra]
+    return casos
+
+
+def _parametros_extrato(parser):
+    """Parâmetros obrigatórios de importar_extrato além do caminho do PDF, com valores fictícios"""
+    obrigatorios = [
+        nome for nome, parametro in inspect.signature(parser.importar_extrato).parameters.items()
+        if parametro.default is inspect.Parameter.empty
+    ]
+    return {nome: CONTA_FICTICIA for nome in obrigatorios[1:]}
+
+
+def executar_caso(tipo, modulo, caminho, tipo_relatorio=None):
+    """Roda um caso neste processo e devolve as métricas (chamado no processo filho)"""
+    paginas = None
+    if tipo == "extrato":
+        from parsers.bancos.extracao import contar_paginas
+        parser = importlib.import_module(f"parsers.bancos.{modulo}")
+        paginas = contar_paginas(caminho)
+        inicio = time.perf_counter()
+        linhas = len(parser.importar_extrato(caminho, **_parametros_extrato(parser)))
+    else:
+        from services.depara import carregar_depara
+        parser = importlib.import_module(f"parsers.{modulo}")
+        mapa = carregar_depara(_caminho("config/DE-PARA.xlsx"))
+        base = _caminho("config/Base_Fornecedores.xlsx")
+        base = base if os.path.exists(base) else None
+        inicio = time.perf_counter()
+        transacoes, _ = parser.importar_arquivo(
+            path_arquivo=caminho, tipo=tipo_relatorio, conta_corrente="", base_path=base, mapa_depara=mapa
+        )
+        linhas = len(transacoes)
+    tempo = time.perf_counter() - inicio
+
+    return {
+        "tempo_s": round(tempo, 4),
+        "pico_memoria_mb": _pico_memoria_mb(),
+        "paginas": paginas,
+        "linhas": linhas,
+        "paginas_por_s": round(paginas / tempo, 2) if paginas and tempo else None,
+        "linhas_por_s": round(linhas / tempo, 1) if tempo else None,
+    }
+
+
+def _rodar_em_processo(caso):
+    nome, tipo, modulo, caminho, tipo_relatorio = caso
+    comando = [sys.executable, "-m", "ferramentas.benchmark", "--caso", tipo, modulo, caminho, tipo_relatorio or ""]
+    ambiente = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [RAIZ, os.environ.get("PYTHONPATH")])))
+    # Pasta temporária como diretório de trabalho: alguns parsers gravam planilhas de apoio nela
+    with tempfile.TemporaryDirectory() as pasta:
+        processo = subprocess.run(comando, cwd=pasta, env=ambiente, capture_output=True, text=True, encoding="utf-8")
+    for linha in reversed(processo.stdout.splitlines()):
+        if linha.startswith(PREFIXO_RESULTADO):
+            return json.loads(linha[len(PREFIXO_RESULTADO):])
+    erro = (processo.stderr.strip().splitlines() or ["sem saída"])[-1]
+    return {"erro": erro}
+
+
+def medir(casos, repeticoes=1):
+    """Métricas de cada caso; com repetições fica o menor tempo e o maior pico de memória"""
+    resultados = {}
+    for caso in casos:
+        if caso[3] is None:
+            resultados[caso[0]] = {"sem_amostra": True}
+            print(f"  {caso[0]}: sem extrato de exemplo, não medido")
+            continue
+        execucoes = [_rodar_em_processo(caso) for _ in range(repeticoes)]
+        validas = [e for e in execucoes if "erro" not in e]
+        if not validas:
+            resultados[caso[0]] = execucoes[0]
+            print(f"  {caso[0]}: ERRO {execucoes[0]['erro']}")
+            continue
+        melhor = dict(min(validas, key=lambda e: e["tempo_s"]))
+        memorias = [e["pico_memoria_mb"] for e in validas if e["pico_memoria_mb"] is not None]
+        melhor["pico_memoria_mb"] = max(memorias) if memorias else None
+        resultados[caso[0]] = melhor
+        print(
+            f"  {caso[0]}: {melhor['tempo_s']:.2f}s, {melhor['pico_memoria_mb']} MB, "
+            f"{melhor['linhas']} linhas ({melhor['linhas_por_s']} linhas/s"
+            + (f", {melhor['paginas_por_s']} páginas/s)" if melhor["paginas_por_s"] else ")")
+        )
+    return resultados
+
+
+def comparar(atual, base, limite=LIMITE_PADRAO):
+    """Lista de pioras (caso, métrica, antes, depois) além do limite relativo e da folga"""
+    pioras = []
+    for nome, metricas in atual["casos"].items():
+        anterior = base["casos"].get(nome)
+        if not anterior or "erro" in anterior or "sem_amostra" in anterior or "sem_amostra" in metricas:
+            continue
+        if "erro" in metricas:
+            pioras.append((nome, "erro", None, metricas["erro"]))
+            continue
+        if metricas["linhas"] != anterior["linhas"]:
+            pioras.append((nome, "linhas", anterior["linhas"], metricas["linhas"]))
+        for metrica in METRICAS:
+            antes, depois = anterior.get(metrica), metricas.get(metrica)
+            if antes is None or depois is None:
+                continue
+            if depois > antes * (1 + limite) and depois - antes > FOLGA[metrica]:
+                pioras.append((nome, metrica, antes, depois))
+    return pioras
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos parsers de extratos e relatórios")
+    parser.add_argument("--saida", default="benchmark.json", help="Arquivo JSON com os resultados")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--limite", type=float, default=LIMITE_PADRAO, help="Piora relativa tolerada (0.2 = 20%%)")
+    parser.add_argument("--repeticoes", type=int, default=1, help="Execuções por caso (fica a mais rápida)")
+    parser.add_argument("--filtro", default="", help="Só os casos cujo nome contém este texto")
+    parser.add_argument("--extrato", action="append", default=[], metavar="BANCO=CAMINHO",
+                        help="Extrato avulso a medir além dos de dados/ (pode repetir)")
+    parser.add_argument("--caso", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.caso:
+        tipo, modulo, caminho, tipo_relatorio = args.caso
+        print(PREFIXO_RESULTADO + json.dumps(executar_caso(tipo, modulo, caminho, tipo_relatorio or None)))
+        return 0
+
+    avulsos = []
+    for texto in args.extrato:
+        banco, _, caminho = texto.partition("=")
+        if banco not in BANCOS or not caminho:
+            parser.error(f"--extrato {texto!r}: use BANCO=CAMINHO com BANCO em {', '.join(BANCOS)}")
+        avulsos.append((banco, caminho))
+    casos = [caso for caso in listar_casos(avulsos) if args.filtro.lower() in caso[0].lower()]
+    print(f"{len(casos)} casos, {max(1, args.repeticoes)} execução(ões) cada")
+    atual = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "workers_pdf": workers_extracao_pdf(),
+        "casos": medir(casos, max(1, args.repeticoes)),
+    }
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(atual, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {args.saida}")
+
+    if not args.comparar:
+        return 0
+    with open(args.comparar, encoding="utf-8") as f:
+        base = json.load(f)
+    pioras = comparar(atual, base, args.limite)
+    for nome, metrica, antes, depois in pioras:
+        print(f"  PIOROU {nome} [{metrica}]: {antes} -> {depois}")
+    print(f"{len(pioras)} piora(s) em relação a {args.comparar}")
+    return 1 if pioras else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
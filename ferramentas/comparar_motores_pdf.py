@@ -0,0 +1,96 @@
+"""Compara os motores de leitura de PDF (pdfplumber x pdfium) nos extratos de dados/.
+
+Para cada PDF mostra o tempo de cada motor, as linhas de texto que diferem e se o
+processar_pagina do banco (reconhecido pela primeira página) devolve os mesmos lançamentos.
+
+Exemplos (da raiz do projeto):
+    python -m ferramentas.comparar_motores_pdf
+    python -m ferramentas.comparar_motores_pdf "dados/mecflu/Extrato Caixa 06-2025.pdf" --diferencas 20
+"""
+import os
+import sys
+import time
+import argparse
+
+from parsers.bancos.extracao import MOTORES, _processar_intervalo, contar_paginas
+from parsers.bancos.registro import carregar_parser, identificar_banco
+
+
+def _texto_pagina(pagina):
+    return pagina.extract_text() or ""
+
+
+def _medir(path_pdf, processar_pagina, motor, total):
+    inicio = time.perf_counter()
+    try:
+        resultado = _processar_intervalo(path_pdf, 0, total, processar_pagina, motor)
+    except Exception as e:
+        return None, time.perf_counter() - inicio, e
+    return resultado, time.perf_counter() - inicio, None
+
+
+def _linhas(paginas):
+    return [linha.strip() for texto in paginas for linha in texto.split("\n")]
+
+
+def comparar_pdf(path_pdf, max_diferencas=5):
+    """Imprime o comparativo de um PDF e devolve True se os lançamentos do parser bateram"""
+    total = contar_paginas(path_pdf)
+    print(f"\n{path_pdf} ({total} páginas)")
+
+    textos = {}
+    for motor in MOTORES:
+        textos[motor], tempo, _ = _medir(path_pdf, _texto_pagina, motor, total)
+        print(f"  texto {motor:<10} {tempo:7.2f}s  {total / tempo if tempo else 0:7.1f} páginas/s")
+
+    base, novo = (_linhas(textos[motor]) for motor in MOTORES)
+    diferencas = [(a, b) for a, b in zip(base, novo) if a != b]
+    print(f"  linhas: {len(base)} x {len(novo)}, diferentes: {len(diferencas)}")
+    for a, b in diferencas[:max_diferencas]:
+        print(f"    pdfplumber| {a}\n    pdfium    | {b}")
+
+    banco = identificar_banco(path_pdf)
+    if not banco:
+        print("  banco não reconhecido, lançamentos não comparados")
+        return True
+    modulo = carregar_parser(banco)
+    resultados = {}
+    for motor in MOTORES:
+        resultados[motor], tempo, erro = _medir(path_pdf, modulo.processar_pagina, motor, total)
+        if erro is not None:
+            print(f"  {banco} {motor:<10} não suportado ({type(erro).__name__}: {erro})")
+            return True
+        linhas = sum(len(pagina) for pagina in resultados[motor])
+        print(f"  {banco} {motor:<10} {tempo:7.2f}s  {linhas} lançamentos")
+
+    iguais = len({repr(r) for r in resultados.values()}) == 1
+    print(f"  lançamentos iguais: {'sim' if iguais else 'NÃO'}")
+    return iguais
+
+
+def _pdfs(caminhos):
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            for pasta, _, arquivos in sorted(os.walk(caminho)):
+                for nome in sorted(arquivos):
+                    if nome.lower().endswith(".pdf"):
+                        yield os.path.join(pasta, nome)
+        else:
+            yield caminho
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara pdfplumber e pdfium nos extratos em PDF")
+    parser.add_argument("caminhos", nargs="*", default=["dados"], help="PDFs ou pastas (padrão: dados/)")
+    parser.add_argument("--diferencas", type=int, default=5, help="Linhas diferentes mostradas por PDF")
+    args = parser.parse_args(argv)
+
+    divergentes = [pdf for pdf in _pdfs(args.caminhos) if not comparar_pdf(pdf, args.diferencas)]
+    if divergentes:
+        print(f"\nLançamentos diferentes em: {', '.join(divergentes)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
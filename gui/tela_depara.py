@@ -1,8 +1,12 @@
 import customtkinter as ctk
 from tkinter import messagebox
-import pandas as pd
 import os
 
+from services.depara import (
+    listar_depara, upsert_depara, exportar_depara_excel, exportar_pendentes_depara, sincronizar_depara,
+    caminho_banco_depara
+)
+
 # CAMINHO_DEPARA = os.path.join("config", "DE-PARA.xlsx")
 CAMINHO_DEPARA = r"\\192.168.10.1\hmpx$\Contabil\Controles Internos\__BEATRIZ\projeto\DE-PARA (1).xlsx"
 
@@ -11,10 +15,19 @@ def abrir_tela_depara(janela_anterior):
 
     janela_depara = ctk.CTkToplevel()
     janela_depara.title("Gerenciar DE-PARA")
-    janela_depara.geometry("560x470")
+    janela_depara.geometry("560x520")
     janela_depara.resizable(False, False)
 
     def fechar_janela():
+        # Os registros incluídos nesta janela vão para a planilha de uma vez, ao fechar
+        try:
+            exportar_pendentes_depara(CAMINHO_DEPARA)
+        except Exception as e:
+            messagebox.showwarning(
+                "Atenção",
+                f"A planilha DE-PARA não pôde ser atualizada agora:\n{e}\n\n"
+                "Os registros novos continuam salvos e vão para ela na próxima exportação."
+            )
         janela_depara.destroy()
         janela_anterior.deiconify()
 
@@ -42,21 +55,11 @@ def abrir_tela_depara(janela_anterior):
     def carregar_registros():
         resultado_box.delete("1.0", "end")
         try:
-            if os.path.exists(CAMINHO_DEPARA):
-                df = pd.read_excel(CAMINHO_DEPARA)
-                df.columns = [col.strip().lower() for col in df.columns]
-                df = df.dropna(how="all")
-
-                for _, row in df.iterrows():
-                    nome = str(row.get("nome", "")).strip()
-                    codigo = str(row.get("codigo", "")).strip()
-
-                    if not nome or not codigo:
-                        continue
-
-                    if codigo.endswith(".0"):
-                        codigo = codigo[:-2]
+            if os.path.exists(CAMINHO_DEPARA) or os.path.exists(caminho_banco_depara(CAMINHO_DEPARA)):
+                sincronizar_depara(CAMINHO_DEPARA)
+                df = listar_depara(CAMINHO_DEPARA)
 
+                for nome, codigo in zip(df["nome"], df["codigo"]):
                     resultado_box.insert("end", f"{nome} -> {codigo}\n")
             else:
                 resultado_box.insert("end", "Arquivo DE-PARA não encontrado.")
@@ -72,16 +75,8 @@ def abrir_tela_depara(janela_anterior):
             return
 
         try:
-            if os.path.exists(CAMINHO_DEPARA):
-                df = pd.read_excel(CAMINHO_DEPARA)
-                df.columns = [col.strip().lower() for col in df.columns]
-            else:
-                df = pd.DataFrame(columns=["nome", "codigo"])
-
-            novo = pd.DataFrame([[nome, codigo]], columns=["nome", "codigo"])
-            df = pd.concat([df, novo], ignore_index=True)
-            df = df.dropna(subset=["nome", "codigo"])
-            df.to_excel(CAMINHO_DEPARA, index=False)
+            # Grava só o registro no banco; a planilha é atualizada ao exportar ou ao fechar a janela
+            upsert_depara(CAMINHO_DEPARA, nome, codigo)
 
             nome_entry.delete(0, "end")
             codigo_entry.delete(0, "end")
@@ -91,6 +86,13 @@ def abrir_tela_depara(janela_anterior):
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao salvar:\n{e}")
 
+    def exportar_planilha():
+        try:
+            exportar_depara_excel(CAMINHO_DEPARA)
+            messagebox.showinfo("Sucesso", "Planilha DE-PARA atualizada.")
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao exportar planilha:\n{e}")
+
     # Botão
     botao_adicionar = ctk.CTkButton(
         master=frame,
@@ -106,5 +108,19 @@ def abrir_tela_depara(janela_anterior):
     )
     botao_adicionar.pack(pady=(0, 10))
 
+    botao_exportar = ctk.CTkButton(
+        master=frame,
+        text="Exportar para Excel",
+        height=36,
+        width=200,
+        font=("Arial", 12, "bold"),
+        corner_radius=12,
+        fg_color="#718096",
+        hover_color="#4A5568",
+        text_color="white",
+        command=exportar_planilha
+    )
+    botao_exportar.pack(pady=(0, 10))
+
     carregar_registros()
     janela_depara.mainloop()
@@ -1,19 +1,15 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
-import importlib
-import pandas as pd
-import threading
 from PIL import Image
 from customtkinter import CTkImage
 
-from services.config import recurso_path, caminho_area_de_trabalho
-from services.depara import carregar_depara
-from services.processamento import (
-    salvar_resultados,
-    remover_transferencias_entre_bancos,
-    gerar_txt_a_partir_do_excel,
-    normalize_text
-)
+from services.config import recurso_path
+from services.pipeline import AUTOMATICO, BANCOS, SessaoConciliacao, resumo_importacao
+from services.rastreamento import rastrear
+from services.tarefas import GerenciadorTarefas, informar_progresso
+
+# Intervalo em que a tela busca os avisos das tarefas em segundo plano
+INTERVALO_EVENTOS_MS = 100
 
 def abrir_tela_parametros(id_empresa, nome_empresa, app_ref):
     import json
@@ -34,6 +30,7 @@ def abrir_tela_parametros(id_empresa, nome_empresa, app_ref):
     janela.geometry("1280x520")
 
     def ao_fechar_janela():
+        gerenciador.cancelar()
         janela.destroy()
         app_ref.deiconify()
 
@@ -53,8 +50,8 @@ def abrir_tela_parametros(id_empresa, nome_empresa, app_ref):
     menu_frame = ctk.CTkFrame(frame, fg_color="transparent")
     menu_frame.pack(pady=(0, 25))
 
-    banco_opcao = ctk.CTkOptionMenu(menu_frame, values=["banco_brasil", "sicredi", "caixa", "itau", "santander", "mercado_pago"], width=340)
-    banco_opcao.set("banco_brasil")
+    banco_opcao = ctk.CTkOptionMenu(menu_frame, values=[AUTOMATICO] + BANCOS, width=340)
+    banco_opcao.set(AUTOMATICO)
     banco_opcao.pack(pady=8)
 
     tipo_opcao = None
@@ -63,9 +60,94 @@ def abrir_tela_parametros(id_empresa, nome_empresa, app_ref):
         tipo_opcao.set("SAIDA")
         tipo_opcao.pack(pady=8)
 
-    parser_empresa = None
-    transacoes_saida, transacoes_entrada, extratos_bancarios = [], [], []
-    conciliacoes_entrada, conciliacoes_saida = [], []
+    sessao = SessaoConciliacao(
+        id_empresa,
+        config=config,
+        caminho_base_fornecedores=CAMINHO_BASE_FORNECEDORES,
+        caminho_depara=recurso_path("config/DE-PARA.xlsx")
+    )
+
+    # === TAREFAS EM SEGUNDO PLANO ===
+    # Uma de cada vez, fora da thread da interface; os avisos voltam por consumir_eventos
+    gerenciador = GerenciadorTarefas()
+    botoes_acao = []
+
+    # === PAINÉIS DE TEXTO (TEMPOS DAS ETAPAS E RESUMO DIÁRIO) ===
+    mostrar_tempos = ctk.BooleanVar(value=False)
+    mostrar_resumo_diario = ctk.BooleanVar(value=False)
+    painel_tempos = {"janela": None, "texto": None}
+    painel_resumo = {"janela": None, "texto": None}
+
+    def atualizar_painel(painel_ref, titulo, conteudo, tamanho="760x420"):
+        if painel_ref["janela"] is None or not painel_ref["janela"].winfo_exists():
+            painel = ctk.CTkToplevel(janela)
+            painel.title(titulo)
+            painel.geometry(tamanho)
+            texto = ctk.CTkTextbox(painel, font=("Courier New", 12), wrap="none")
+            texto.pack(expand=True, fill="both", padx=10, pady=10)
+            painel_ref.update(janela=painel, texto=texto)
+        texto = painel_ref["texto"]
+        texto.configure(state="normal")
+        texto.delete("1.0", "end")
+        texto.insert("1.0", conteudo)
+        texto.configure(state="disabled")
+        painel_ref["janela"].lift()
+
+    def atualizar_painel_tempos(resumo):
+        if mostrar_tempos.get():
+            atualizar_painel(painel_tempos, "Tempos da última execução", resumo)
+
+    def atualizar_painel_resumo():
+        """Totais por dia com o que já foi importado (vêm dos agregados da sessão, sem reprocessar)"""
+        if not mostrar_resumo_diario.get():
+            return
+        resumo = sessao.resumo_diario()
+        conteudo = resumo.to_string(index=False) if not resumo.empty else "Nada importado ainda."
+        atualizar_painel(painel_resumo, "Resumo diário", conteudo, "1100x480")
+
+    def executar(nome, trabalho, ao_concluir, titulo_erro):
+        """Enfileira trabalho(tarefa) rastreado; ao_concluir e as mensagens rodam na thread da interface"""
+        rastros = []
+
+        def rodar(tarefa):
+            with rastrear(nome) as rastro:
+                rastros.append(rastro)
+                return trabalho(tarefa)
+
+        def finalizar():
+            atualizar_estado()
+            if rastros:
+                atualizar_painel_tempos(rastros[0].resumo())
+
+        def concluir(resultado):
+            finalizar()
+            ao_concluir(resultado)
+
+        def falhar(erro):
+            finalizar()
+            messagebox.showerror("Erro", f"{titulo_erro}:\n{erro}")
+
+        def cancelar():
+            finalizar()
+            messagebox.showinfo("Cancelado", "Operação cancelada. Os dados importados antes dela foram mantidos.")
+
+        tarefa = gerenciador.enviar(
+            nome, rodar, ao_concluir=concluir, ao_falhar=falhar, ao_cancelar=cancelar, ao_progredir=mostrar_progresso
+        )
+        if tarefa is None:
+            messagebox.showinfo("Aguarde", "Essa operação já está em andamento.")
+        atualizar_estado()
+
+    def progresso_importacao(concluidos, total, situacao):
+        estado = "erro" if situacao["erro"] else f"{situacao['linhas']} linhas"
+        informar_progresso(f"{concluidos}/{total}: {situacao['arquivo']} ({estado})", concluidos / total)
+
+    def mostrar_resumo_importacao(titulo, situacoes):
+        atualizar_painel_resumo()
+        if any(s["erro"] for s in situacoes):
+            messagebox.showwarning(titulo, resumo_importacao(situacoes))
+        else:
+            messagebox.showinfo(titulo, resumo_importacao(situacoes))
 
     def importar_relatorios_empresa():
         caminhos_relatorios = filedialog.askopenfilenames(
@@ -75,101 +157,74 @@ def abrir_tela_parametros(id_empresa, nome_empresa, app_ref):
         if not caminhos_relatorios:
             return
 
-        tipos = [tipo_opcao.get()] if tipo_opcao else [None]
-        modo_automatico = tipo_opcao is None
+        tipo = tipo_opcao.get() if tipo_opcao else None
         conta_corrente = conta_corrente_entry.get()
-        mapa = carregar_depara(recurso_path("config/DE-PARA.xlsx"))
-
-        try:
-            nonlocal parser_empresa
-            parser_empresa = importlib.import_module(f"parsers.{nome_parser_empresa}")
-
-            for tipo in tipos:
-                for caminho in caminhos_relatorios:
-                    transacoes, conciliacao = parser_empresa.importar_arquivo(
-                        path_arquivo=caminho,
-                        tipo=tipo,
-                        conta_corrente=conta_corrente,
-                        base_path=CAMINHO_BASE_FORNECEDORES,
-                        mapa_depara=mapa
-                    )
-                    if modo_automatico:
-                        for t in transacoes:
-                            (transacoes_saida if t["tipo"] == "D" else transacoes_entrada).append(t)
-                        for c in conciliacao:
-                            (conciliacoes_saida if c["tipo"] == "D" else conciliacoes_entrada).append(c)
-                    else:
-                        (transacoes_saida if tipo == "SAIDA" else transacoes_entrada).extend(transacoes)
-                        (conciliacoes_saida if tipo == "SAIDA" else conciliacoes_entrada).extend(conciliacao)
-
-            messagebox.showinfo("Sucesso", "Relatórios importados com sucesso.")
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao importar relatórios:\n{e}")
+        executar(
+            "importar_relatorios",
+            lambda tarefa: sessao.importar_arquivos(
+                relatorios=[(tipo, caminho) for caminho in caminhos_relatorios],
+                conta_corrente=conta_corrente,
+                ao_progredir=progresso_importacao
+            ),
+            lambda situacoes: mostrar_resumo_importacao("Relatórios importados", situacoes),
+            "Erro ao importar relatórios"
+        )
 
     def importar_extrato():
-        caminho_extrato = filedialog.askopenfilename(
-            title="Selecionar Extrato Bancário (PDF)",
+        caminhos_extratos = filedialog.askopenfilenames(
+            title="Selecionar Extratos Bancários (PDF)",
             filetypes=[("Arquivos PDF", "*.pdf")]
         )
-        if not caminho_extrato:
+        if not caminhos_extratos:
             return
 
-        banco_selecionado = banco_opcao.get()
-        try:
-            parser_banco = importlib.import_module(f"parsers.bancos.{banco_selecionado}")
-            extrato = parser_banco.importar_extrato(caminho_extrato)
-            extrato["banco"] = banco_selecionado
-            if extrato.empty:
-                messagebox.showwarning("Aviso", f"O extrato do banco {banco_selecionado} está vazio.")
-                return
-            extratos_bancarios.append(extrato)
-            messagebox.showinfo("Sucesso", f"Extrato de {banco_selecionado} adicionado.")
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao importar extrato:\n{e}")
+        def concluir(situacoes):
+            vazios = [s["arquivo"] for s in situacoes if not s["erro"] and not s["linhas"]]
+            if vazios:
+                messagebox.showwarning("Aviso", "Extrato(s) sem lançamentos:\n" + "\n".join(vazios))
+            mostrar_resumo_importacao("Extratos adicionados", situacoes)
+
+        banco = banco_opcao.get()
+        executar(
+            "importar_extrato",
+            lambda tarefa: sessao.importar_arquivos(
+                extratos=[(banco, caminho) for caminho in caminhos_extratos],
+                ao_progredir=progresso_importacao
+            ),
+            concluir,
+            "Erro ao importar extrato"
+        )
 
     def processar_tudo():
-        if not extratos_bancarios:
+        if not len(sessao.extratos):
             messagebox.showerror("Erro", "Nenhum extrato bancário foi importado.")
             return
-        if not transacoes_saida and not transacoes_entrada:
+        if not sessao.tem_relatorios():
             messagebox.showerror("Erro", "Importe pelo menos um relatório de SAÍDA ou ENTRADA.")
             return
-        try:
-            extrato_banco = pd.concat(extratos_bancarios, ignore_index=True)
-            if nome_parser_empresa == "mecflu":
-                extrato_banco = remover_transferencias_entre_bancos(extrato_banco)
 
-            nome_limpo = normalize_text(nome_empresa).replace(" ", "_")
-            conta_corrente = conta_corrente_entry.get().strip()
-            nome_base = f"{nome_limpo}_{conta_corrente}"
-
-            todas_transacoes_empresa = transacoes_saida + transacoes_entrada
-            salvar_resultados(todas_transacoes_empresa, nome_base=f"Empresa_{nome_base}", salvar_txt=True)
-
-            resumo_saida = parser_empresa.conciliar_saidas(
-                [mov for mov in conciliacoes_saida if mov["tipo"] == "D"],
-                extrato_banco
+        def concluir(gerados):
+            arquivos = [os.path.basename(c) for caminhos in gerados.values() for c in caminhos]
+            messagebox.showinfo(
+                "Arquivos salvos com sucesso!",
+                f"Foram gerados:\n\n" + "\n".join(arquivos) + f"\n\nNa sua área de trabalho."
             )
-            salvar_resultados(resumo_saida, nome_base=f"Saida_{nome_base}")
 
-            resumo_entrada = parser_empresa.conciliar_entradas(
-                [mov for mov in conciliacoes_entrada if mov["tipo"] == "C"],
-                extrato_banco
-            )
-            salvar_resultados(resumo_entrada, nome_base=f"Entrada_{nome_base}")
-
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro no processamento:\n{e}")
+        conta_corrente = conta_corrente_entry.get().strip()
+        executar(
+            "processar_tudo",
+            lambda tarefa: sessao.processar(nome_empresa, conta_corrente=conta_corrente),
+            concluir,
+            "Erro no processamento"
+        )
 
     def resetar_dados():
-        nonlocal transacoes_saida, transacoes_entrada, extratos_bancarios
-        nonlocal conciliacoes_entrada, conciliacoes_saida
-        transacoes_saida.clear()
-        transacoes_entrada.clear()
-        extratos_bancarios.clear()
-        conciliacoes_entrada.clear()
-        conciliacoes_saida.clear()
-        messagebox.showinfo("Reset concluído", "Todos os dados foram apagados.")
+        executar(
+            "resetar_dados",
+            lambda tarefa: sessao.resetar(),
+            lambda _: (atualizar_painel_resumo(), messagebox.showinfo("Reset concluído", "Todos os dados foram apagados.")),
+            "Erro ao resetar"
+        )
 
     # === LOADING/SPINNER ===
     spinner_frames = []
@@ -206,28 +261,47 @@ def abrir_tela_parametros(id_empresa, nome_empresa, app_ref):
     def ocultar_loading():
         spinner_container.place_forget()
 
-    def executar_em_thread(func):
-        def iniciar():
-            def run():
-                try:
-                    func()
-                finally:
-                    janela.after(0, ocultar_loading)
-            threading.Thread(target=run, daemon=True).start()
-        mostrar_loading()
-        janela.after(200, iniciar)
+    carregando = {"ativo": False}
+    cancelar_botao = ctk.CTkButton(spinner_container, text="Cancelar", width=100, command=lambda: cancelar_tarefas())
+    cancelar_botao.place(relx=0.5, rely=0.88, anchor="center")
+
+    def mostrar_progresso(texto, fracao=None):
+        spinner_text.configure(text=texto)
+
+    def cancelar_tarefas():
+        gerenciador.cancelar()
+        spinner_text.configure(text="Cancelando...")
+
+    def atualizar_estado():
+        """Spinner e botões conforme haja tarefa na fila (evita disparar a mesma ação duas vezes)"""
+        ocupado = gerenciador.ocupado()
+        for botao in botoes_acao:
+            botao.configure(state="disabled" if ocupado else "normal")
+        if ocupado and not carregando["ativo"]:
+            carregando["ativo"] = True
+            spinner_text.configure(text="Processando, aguarde...")
+            mostrar_loading()
+        elif not ocupado and carregando["ativo"]:
+            carregando["ativo"] = False
+            ocultar_loading()
+
+    def consumir_eventos():
+        if not janela.winfo_exists():
+            return
+        gerenciador.processar_eventos()
+        janela.after(INTERVALO_EVENTOS_MS, consumir_eventos)
 
     # === BOTÕES ===
     botoes_frame = ctk.CTkFrame(frame, fg_color="transparent")
     botoes_frame.pack(pady=10)
     botoes = [
-        ("Importar Relatório da Empresa", lambda: executar_em_thread(importar_relatorios_empresa), "#ED8936", "#DD6B20"),
-        ("Adicionar Extrato Bancário", lambda: executar_em_thread(importar_extrato), "#3182CE", "#225EA8"),
-        ("Processar Tudo", lambda: executar_em_thread(processar_tudo), "#2F855A", "#276749"),
-        ("Resetar Dados", lambda: executar_em_thread(resetar_dados), "#E53E3E", "#C53030"),
+        ("Importar Relatório da Empresa", importar_relatorios_empresa, "#ED8936", "#DD6B20"),
+        ("Adicionar Extrato Bancário", importar_extrato, "#3182CE", "#225EA8"),
+        ("Processar Tudo", processar_tudo, "#2F855A", "#276749"),
+        ("Resetar Dados", resetar_dados, "#E53E3E", "#C53030"),
     ]
     for i, (texto, comando, cor, cor_hover) in enumerate(botoes):
-        ctk.CTkButton(
+        botao = ctk.CTkButton(
             botoes_frame,
             text=texto,
             width=240,
@@ -237,4 +311,15 @@ def abrir_tela_parametros(id_empresa, nome_empresa, app_ref):
             hover_color=cor_hover,
             corner_radius=15,
             command=comando
-        ).grid(row=0, column=i, padx=10)
+        )
+        botao.grid(row=0, column=i, padx=10)
+        botoes_acao.append(botao)
+
+    opcoes_frame = ctk.CTkFrame(frame, fg_color="transparent")
+    opcoes_frame.pack(pady=(10, 0))
+    ctk.CTkCheckBox(opcoes_frame, text="Mostrar tempos das etapas", variable=mostrar_tempos).grid(row=0, column=0, padx=10)
+    ctk.CTkCheckBox(
+        opcoes_frame, text="Mostrar resumo diário", variable=mostrar_resumo_diario, command=atualizar_painel_resumo
+    ).grid(row=0, column=1, padx=10)
+
+    consumir_eventos()
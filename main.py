@@ -1,4 +1,8 @@
+import multiprocessing
+
 from gui.app import iniciar_aplicacao
 
 if __name__ == "__main__":
+    # Necessário para o pool de extração de PDF no executável do PyInstaller
+    multiprocessing.freeze_support()
     iniciar_aplicacao()
@@ -1,77 +1,77 @@
-import pdfplumber
 import pandas as pd
 from datetime import datetime
 import re
-import unicodedata
 
-def normalizar(texto: str) -> str:
-    texto = unicodedata.normalize("NFD", texto)
-    texto = texto.encode("ascii", "ignore").decode("utf-8")
-    texto = re.sub(r"\s+", "", texto)  # remove todos os espaços
-    return texto.lower()
+from parsers.bancos.extracao import extrair_paginas
+from services.normalizacao import normalizar_compacto
+from services.valores import valores_em_centavos
+from services.lancamentos import em_reais
 
-def importar_extrato(path_pdf: str) -> pd.DataFrame:
+# Incrementar sempre que a saída do parser mudar (invalida o cache de extratos)
+VERSAO_PARSER = "2"
+
+def processar_pagina(page) -> list:
     dados = []
+    tables = page.extract_tables()
+    for table in tables:
+        for row in table:
+            if not row or len(row) < 2:
+                continue
+
+            linha = [str(cell).strip() if cell else "" for cell in row]
+
+            if not re.match(r"\d{2}/\d{2}/\d{4}", linha[0]):
+                continue
+
+            data_br = linha[0]
+            try:
+                data_fmt = datetime.strptime(data_br, "%d/%m/%Y").date()
+            except:
+                continue
+
+            valor = None
+            tipo = ""
+            for campo in linha:
+                match = re.search(r"(\d{1,3}(?:\.\d{3})*,\d{2})([CD])", campo.replace(" ", ""))
+                if match:
+                    valor_str, tipo = match.groups()
+                    # Sufixo D deixa o valor negativo (services.valores)
+                    valor = valor_str + tipo
+                    break
+
+            if valor is None:
+                continue
+
+            historico = " ".join(linha[1:-1])
+            historico = re.sub(r"\s{2,}", " ", historico).strip()
+            historico_normalizado = normalizar_compacto(historico)
+
+            if "saldo" in historico_normalizado:
+                continue
+
+            dados.append({
+                "data": pd.to_datetime(data_fmt),
+                "valor": valor,
+                "tipo": tipo,
+                "historico": historico
+            })
+    return dados
 
-    with pdfplumber.open(path_pdf) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables()
-            for table in tables:
-                for row in table:
-                    if not row or len(row) < 2:
-                        continue
-
-                    linha = [str(cell).strip() if cell else "" for cell in row]
-
-                    if not re.match(r"\d{2}/\d{2}/\d{4}", linha[0]):
-                        continue
-
-                    data_br = linha[0]
-                    try:
-                        data_fmt = datetime.strptime(data_br, "%d/%m/%Y").date()
-                    except:
-                        continue
-
-                    valor = None
-                    tipo = ""
-                    for campo in linha:
-                        match = re.search(r"(\d{1,3}(?:\.\d{3})*,\d{2})([CD])", campo.replace(" ", ""))
-                        if match:
-                            valor_str, tipo = match.groups()
-                            valor = float(valor_str.replace(".", "").replace(",", "."))
-                            if tipo == "D":
-                                valor *= -1
-                            break
-
-                    if valor is None:
-                        continue
-
-                    historico = " ".join(linha[1:-1])
-                    historico = re.sub(r"\s{2,}", " ", historico).strip()
-                    historico_normalizado = normalizar(historico)
-
-                    if "saldo" in historico_normalizado:
-                        continue
-
-                    dados.append({
-                        "data": pd.to_datetime(data_fmt),
-                        "valor": round(valor, 2),
-                        "tipo": tipo,
-                        "historico": historico
-                    })
+def importar_extrato(path_pdf: str) -> pd.DataFrame:
+    dados = [linha for pagina in extrair_paginas(path_pdf, processar_pagina) for linha in pagina]
 
     # Remove "Saldo Anterior" apenas se for o primeiro lançamento
     if dados and "saldo anterior" in dados[0]["historico"].lower():
         dados = dados[1:]
 
-    df = pd.DataFrame(dados)
+    df = valores_em_centavos(pd.DataFrame(dados))
 
     # Separa por tipo
     df_credito = df[df["tipo"] == "C"]
     df_debito = df[df["tipo"] == "D"]
 
     # Salva os arquivos
-    df_credito.to_excel("extrato_creditos.xlsx", index=False)
-    df_debito.to_excel("extrato_debitos.xlsx", index=False)
+    em_reais(df_credito).to_excel("extrato_creditos.xlsx", index=False)
+    em_reais(df_debito).to_excel("extrato_debitos.xlsx", index=False)
 
     return df
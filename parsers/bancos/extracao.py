@@ -0,0 +1,196 @@
+import math
+import multiprocessing
+import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_raw
+from pdfplumber.utils import chars_to_textmap
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TempoEsgotado
+
+from services.config import workers_extracao_pdf, motor_extracao_pdf
+from services.tarefas import Cancelado, verificar_cancelamento
+
+# Abaixo disso o custo de subir os processos supera o ganho
+MIN_PAGINAS_PARALELO = 6
+
+MOTOR_PADRAO = "pdfplumber"
+
+# Intervalo com que o processo principal confere se a tarefa foi cancelada enquanto espera os lotes
+ESPERA_CANCELAMENTO_S = 0.2
+
+# Nos processos filhos: evento ligado pelo processo principal quando a tarefa é cancelada
+_cancelamento_processo = None
+
+# Quebras de linha e hífens que o pdfium insere por conta própria (não existem no PDF)
+_CODIGOS_IGNORADOS = (0, 2, 10, 13)
+
+
+class PaginaPdfium:
+    """Página lida pelo pdfium, com o mesmo extract_text() da página do pdfplumber.
+
+    Só serve a parsers que leem a camada de texto (sem extract_tables). As linhas são
+    montadas pelo mesmo agrupamento do pdfplumber a partir das caixas de cada caractere;
+    página girada ou com caixas sem área volta a ser lida pelo pdfplumber.
+    """
+
+    def __init__(self, path_pdf, pagina, numero):
+        self.path_pdf = path_pdf
+        self.page_number = numero
+        self._pagina = pagina
+
+    def _caracteres(self):
+        if self._pagina.get_rotation():
+            return None
+        x0, y0, _, y1 = self._pagina.get_mediabox()
+        textpage = self._pagina.get_textpage()
+        try:
+            caracteres = []
+            for i in range(textpage.count_chars()):
+                codigo = pdfium_raw.FPDFText_GetUnicode(textpage.raw, i)
+                if codigo in _CODIGOS_IGNORADOS or pdfium_raw.FPDFText_IsGenerated(textpage.raw, i):
+                    continue
+                esquerda, base, direita, topo = textpage.get_charbox(i, loose=True)
+                texto = chr(codigo)
+                if (esquerda == direita or base == topo) and not texto.isspace():
+                    return None
+                caracteres.append({
+                    "text": texto,
+                    "x0": esquerda - x0, "x1": direita - x0,
+                    "top": y1 - topo, "bottom": y1 - base, "doctop": y1 - topo,
+                    "width": direita - esquerda, "height": topo - base,
+                    "upright": True,
+                })
+            return caracteres
+        finally:
+            textpage.close()
+
+    def extract_text(self):
+        caracteres = self._caracteres()
+        if caracteres is None:
+            with pdfplumber.open(self.path_pdf, pages=[self.page_number]) as pdf:
+                return pdf.pages[0].extract_text()
+        return chars_to_textmap(caracteres).as_string if caracteres else ""
+
+    def close(self):
+        self._pagina.close()
+
+
+def _paginas_pdfplumber(path_pdf, inicio, fim):
+    with pdfplumber.open(path_pdf, pages=list(range(inicio + 1, fim + 1))) as pdf:
+        for page in pdf.pages:
+            yield page
+            page.close()
+
+
+def _paginas_pdfium(path_pdf, inicio, fim):
+    pdf = pdfium.PdfDocument(path_pdf)
+    try:
+        for indice in range(inicio, fim):
+            pagina = PaginaPdfium(path_pdf, pdf[indice], indice + 1)
+            yield pagina
+            pagina.close()
+    finally:
+        pdf.close()
+
+
+MOTORES = {
+    "pdfplumber": _paginas_pdfplumber,
+    "pdfium": _paginas_pdfium,
+}
+
+
+def _iniciar_processo(evento):
+    global _cancelamento_processo
+    _cancelamento_processo = evento
+
+
+def _processar_intervalo(path_pdf, inicio, fim, processar_pagina, motor=MOTOR_PADRAO):
+    resultados = []
+    for pagina in MOTORES[motor](path_pdf, inicio, fim):
+        verificar_cancelamento()
+        if _cancelamento_processo is not None and _cancelamento_processo.is_set():
+            raise Cancelado("extração cancelada")
+        resultados.append(processar_pagina(pagina))
+    return resultados
+
+
+def _aguardar(futuro, cancelamento):
+    """Resultado do lote, conferindo o cancelamento enquanto espera; cancelado, avisa os processos filhos"""
+    while True:
+        try:
+            return futuro.result(timeout=ESPERA_CANCELAMENTO_S)
+        except TempoEsgotado:
+            try:
+                verificar_cancelamento()
+            except Cancelado:
+                cancelamento.set()
+                raise
+
+
+def _dividir_paginas(total, workers):
+    # Lotes contíguos, alguns a mais que o número de processos para equilibrar a carga
+    tamanho = max(1, math.ceil(total / (workers * 2)))
+    return [(inicio, min(inicio + tamanho, total)) for inicio in range(0, total, tamanho)]
+
+
+def contar_paginas(path_pdf):
+    pdf = pdfium.PdfDocument(path_pdf)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def texto_primeira_pagina(path_pdf):
+    """Texto só da primeira página (ex: para reconhecer o banco sem ler o extrato todo)"""
+    paginas = _paginas_pdfium(path_pdf, 0, min(1, contar_paginas(path_pdf)))
+    try:
+        return next((pagina.extract_text() or "" for pagina in paginas), "")
+    finally:
+        paginas.close()
+
+
+def motor_efetivo(motor=MOTOR_PADRAO):
+    """Motor que extrair_paginas vai de fato usar (HMPX_MOTOR_PDF só vale para quem pediu outro motor)"""
+    return motor if motor == MOTOR_PADRAO else motor_extracao_pdf(motor)
+
+
+def motor_do_parser(parser_banco):
+    return motor_efetivo(getattr(parser_banco, "MOTOR_PDF", MOTOR_PADRAO))
+
+
+def extrair_paginas(path_pdf, processar_pagina, workers=None, motor=MOTOR_PADRAO):
+    """Aplica processar_pagina(page) em cada página do PDF e devolve os resultados na ordem das páginas.
+
+    processar_pagina precisa ser uma função de nível de módulo (é enviada aos processos filhos).
+    motor "pdfium" entrega PaginaPdfium (só extract_text); "pdfplumber" entrega a página completa.
+    """
+    if workers is None:
+        workers = workers_extracao_pdf()
+    motor = motor_efetivo(motor)
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de PDF desconhecido: {motor} (use {', '.join(MOTORES)})")
+    total = contar_paginas(path_pdf)
+
+    if workers > 1 and total >= MIN_PAGINAS_PARALELO:
+        lotes = _dividir_paginas(total, workers)
+        cancelamento = multiprocessing.Event()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(lotes)), initializer=_iniciar_processo, initargs=(cancelamento,)
+            ) as executor:
+                futuros = [
+                    executor.submit(_processar_intervalo, path_pdf, inicio, fim, processar_pagina, motor)
+                    for inicio, fim in lotes
+                ]
+                try:
+                    return [pagina for futuro in futuros for pagina in _aguardar(futuro, cancelamento)]
+                except Cancelado:
+                    # Os lotes em andamento param na próxima página; os que não começaram nem rodam
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise
+        except Cancelado:
+            raise
+        except Exception as e:
+            print(f"[PDF] Extração paralela falhou, seguindo sequencial: {e}")
+
+    return _processar_intervalo(path_pdf, 0, total, processar_pagina, motor)
@@ -1,95 +1,98 @@
-import pdfplumber
+import numpy as np
 import pandas as pd
 import re
-import unicodedata
 from datetime import datetime
 
-def normalize(text):
-    if not isinstance(text, str):
-        return text
-    return unicodedata.normalize("NFD", text).encode("ascii", "ignore").decode("utf-8").strip().lower()
+from parsers.bancos.extracao import MOTOR_PADRAO, extrair_paginas
+from services.categorias import compilar, ler_config, primeira_regra
+from services.normalizacao import remover_acentos
+from services.valores import valores_em_centavos, tipo_pelo_sinal
 
-def importar_extrato(pdf_path: str, conta_corrente: str, conta_titulos: str) -> pd.DataFrame:
-    linhas = []
+# Incrementar sempre que a saída do parser mudar (invalida o cache de extratos)
+VERSAO_PARSER = "4"
+
+# Fica no pdfplumber: o pdfium muda o espaço depois de ":" e "," e o filtro de linhas depende desses
+# trechos ("agência: conta:", "periodo:"); sem extrato de exemplo para comparar linha a linha
+MOTOR_PDF = MOTOR_PADRAO
 
-    with pdfplumber.open(pdf_path) as pdf:
-        for pagina in pdf.pages:
-            texto = pagina.extract_text()
-            if texto:
-                linhas.extend(texto.split("\n"))
+# Linhas ignoradas (termos e padrões, testados na linha em minúsculas) e contas especiais (termo -> conta
+# que substitui a de títulos; vale o primeiro termo encontrado, na ordem do arquivo)
+CAMINHO_REGRAS = "config/mercado_pago.json"
 
-    skip_keywords = [
-        "detalhe dos movimentos", "data de geração", "você tem alguma dúvida?",
-        "mercado pago instituição", "agência: conta:", "periodo:", "saldo inicial", "saldo final",
-        "encontre nossos canais", "descrição", "id da operação", "valor", "saldo", "o nosso sac",
-        "ligue para", "ouvidoria", "cnpj", "av. das nações unidas", "portal de ajuda", "www.mercadopago"
-    ]
-    skip_regex = re.compile(r"\d+/3|^data\s|^descrição\s|^id da operação|^valo", re.IGNORECASE)
+def carregar_regras(caminho_relativo=CAMINHO_REGRAS):
+    """(regex das linhas ignoradas, regex dos termos das contas especiais, contas) compilados do arquivo"""
+    regras = ler_config(caminho_relativo)
+    ignoradas = regras["linhas_ignoradas"]
+    ignorar = re.compile(
+        "|".join([re.escape(termo) for termo in ignoradas["termos"]] + ignoradas["padroes"]), re.IGNORECASE
+    )
+    especiais = regras["contas_especiais"]
+    termos = compilar([{"termos": [e["termo"]]} for e in especiais])
+    return ignorar, termos, [e["conta"] for e in especiais]
 
-    linhas_filtradas = [
-        l.strip() for l in linhas
-        if l.strip()
-        and not any(kw in l.lower() for kw in skip_keywords)
-        and not skip_regex.search(l.lower())
-    ]
+# Compiladas uma vez por processo: um teste por linha e um por transação
+_ignorar, _termos_especiais, _contas_especiais = carregar_regras()
+_inicio_transacao = re.compile(r"\d{2}-\d{2}-\d{4}")
+# Com espaço antes do id da operação e, se não casar, com o id grudado na descrição (grupos 6 a 10)
+_transacao = re.compile(
+    r"(?:(\d{2}-\d{2}-\d{4})\s+(.+?)\s+(\d{9,})\s+R\$ (.+?)\s+R\$ (.+))"
+    r"|(?:(\d{2}-\d{2}-\d{4})\s+(.+?)(\d{9,})\s+R\$ (.+?)\s+R\$ (.+))"
+)
 
-    # Agrupar transações por data
-    transacoes_raw = []
+def processar_pagina(pagina) -> list:
+    """Linhas úteis da página, já sem cabeçalhos e rodapés"""
+    texto = pagina.extract_text()
+    if not texto:
+        return []
+    return [linha.strip() for linha in texto.split("\n") if linha.strip() and not _ignorar.search(linha.lower())]
+
+def _transacoes(paginas):
+    """Junta as linhas em transações numa passada só: cada linha com data começa uma nova"""
     buffer = []
-    for linha in linhas_filtradas:
-        if re.match(r"\d{2}-\d{2}-\d{4}", linha):
-            if buffer:
-                transacoes_raw.append(" ".join(buffer))
-            buffer = []
-        buffer.append(linha)
+    for linhas in paginas:
+        for linha in linhas:
+            if _inicio_transacao.match(linha):
+                if buffer:
+                    yield " ".join(buffer)
+                buffer = []
+            buffer.append(linha)
     if buffer:
-        transacoes_raw.append(" ".join(buffer))
+        yield " ".join(buffer)
+
+def importar_extrato(pdf_path: str, conta_corrente: str, conta_titulos: str) -> pd.DataFrame:
+    paginas = extrair_paginas(pdf_path, processar_pagina, motor=MOTOR_PDF)
 
     registros = []
-    for entrada in transacoes_raw:
-        match = re.match(r"(\d{2}-\d{2}-\d{4})\s+(.+?)\s+(\d{9,})\s+R\$ (.+?)\s+R\$ (.+)", entrada)
-        if not match:
-            match = re.match(r"(\d{2}-\d{2}-\d{4})\s+(.+?)(\d{9,})\s+R\$ (.+?)\s+R\$ (.+)", entrada)
+    for entrada in _transacoes(paginas):
+        match = _transacao.match(entrada)
         if not match:
             continue
 
-        data_str, descricao, operacao_id, valor_str, _ = match.groups()
+        grupos = match.groups()
+        data_str, descricao, operacao_id, valor_str, _ = grupos[:5] if match.group(1) else grupos[5:]
         try:
             data = datetime.strptime(data_str, "%d-%m-%Y").date()
-            valor = float(valor_str.replace(".", "").replace(",", "."))
-            historico = normalize(f"{descricao} - {operacao_id}")
-            tipo = "C" if valor > 0 else "D"
-
-            conta_debito = conta_titulos if tipo == "D" else conta_corrente
-            conta_credito = conta_corrente if tipo == "D" else conta_titulos
-
-            # Regras especiais
-            desc_norm = normalize(descricao)
-            mapa_especifico = {
-                "transferencia pix enviada": "14008",  
-                "debito por divida imposto interestadual": "5235", 
-                "pagamento cartao de credito": "1737", 
-                "iof": "4670",
-                "debito por divida diferenca da aliquota (difal)": "5235"
-            }
-
-            for termo, conta_esp in mapa_especifico.items():
-                if termo in desc_norm:
-                    if tipo == "D":
-                        conta_debito, conta_credito = conta_esp, conta_corrente
-                    else:
-                        conta_debito, conta_credito = conta_corrente, conta_esp
-                    break
-
-            registros.append({
-                "data": data,
-                "historico": historico,
-                "valor": round(valor, 2),
-                "tipo": tipo,
-                "conta_debito": conta_debito,
-                "conta_credito": conta_credito
-            })
         except Exception as e:
             print(f"[Mercado Pago] Erro ao processar: {entrada} -> {e}")
+            continue
+        registros.append({
+            "data": data,
+            "historico": remover_acentos(f"{descricao} - {operacao_id}").lower(),
+            "valor": valor_str,
+            "descricao": remover_acentos(descricao).lower(),
+        })
+
+    # Valores convertidos de uma vez; o tipo e as contas saem do sinal
+    df = valores_em_centavos(pd.DataFrame(registros))
+    if "centavos" not in df.columns:
+        return pd.DataFrame()
+    df["tipo"] = tipo_pelo_sinal(df["centavos"])
+
+    # Regras especiais: a conta do termo entra no lugar da conta de títulos
+    regra = primeira_regra(_termos_especiais, df["descricao"])
+    contrapartida = np.array(_contas_especiais + [conta_titulos], dtype=object)[regra]
+    debito = (df["tipo"] == "D").to_numpy()
+    df["conta_debito"] = np.where(debito, contrapartida, conta_corrente)
+    df["conta_credito"] = np.where(debito, conta_corrente, contrapartida)
 
-    return pd.DataFrame(registros)
+    return df.drop(columns="descricao")
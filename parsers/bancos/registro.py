@@ -0,0 +1,71 @@
+import os
+import re
+import importlib
+
+from parsers.bancos.extracao import texto_primeira_pagina
+from services.normalizacao import normalizar_texto
+
+# Opção da interface/linha de comando para reconhecer o banco pelo conteúdo do PDF
+AUTOMATICO = "automatico"
+
+# Trechos da primeira página (normalizada: sem acentos, minúscula, numa linha só) que
+# identificam o extrato de cada banco. Testados nesta ordem; mercado_pago por último
+# porque "mercado pago" também aparece em históricos de outros bancos.
+IDENTIFICACAO = {
+    "banco_brasil": r"extrato de conta corrente .*dt\. balancete dt\. movimento",
+    "sicredi": r"associado: .* cooperativa: \d+",
+    "caixa": r"gerenciador\.caixa\.gov\.br|sac caixa|alo caixa",
+    "itau": r"lancamentos periodo: \d{2}/\d{2}/\d{4} ate .*data lancamentos ag/origem",
+    "santander": r"internet banking empresarial .*agencia: \d+ conta: \d+",
+    "mercado_pago": r"mercado pago instituicao de pagamento|www\.mercadopago",
+}
+
+# Trechos do nome do arquivo, para quando a primeira página não tem texto reconhecível
+PISTAS_BANCO = {
+    "banco_brasil": ["extrato bb", " bb ", "banco do brasil"],
+    "sicredi": ["sicredi"],
+    "caixa": ["caixa", "cef"],
+    "itau": ["itau"],
+    "santander": ["santander"],
+    "mercado_pago": ["mercado pago", "mercadopago"],
+}
+
+BANCOS = list(IDENTIFICACAO)
+
+_padroes = {banco: re.compile(padrao) for banco, padrao in IDENTIFICACAO.items()}
+# Módulos já importados: cada parser só é carregado no primeiro extrato do banco
+_parsers = {}
+
+
+def carregar_parser(banco):
+    if banco not in IDENTIFICACAO:
+        raise ValueError(f"Banco desconhecido: {banco} (use {', '.join(BANCOS)})")
+    if banco not in _parsers:
+        _parsers[banco] = importlib.import_module(f"parsers.bancos.{banco}")
+    return _parsers[banco]
+
+
+def banco_pelo_conteudo(path_pdf):
+    """Reconhece o banco lendo só o texto da primeira página; None se nenhum bater"""
+    try:
+        texto = normalizar_texto(texto_primeira_pagina(path_pdf))
+    except Exception as e:
+        print(f"[REGISTRO] Não foi possível ler a primeira página de {os.path.basename(path_pdf)}: {e}")
+        return None
+    for banco, padrao in _padroes.items():
+        if padrao.search(texto):
+            return banco
+    return None
+
+
+def banco_pelo_nome(path_pdf):
+    nome = f" {normalizar_texto(os.path.splitext(os.path.basename(path_pdf))[0])} "
+    for banco, pistas in PISTAS_BANCO.items():
+        if any(pista in nome for pista in pistas):
+            return banco
+    return None
+
+
+def identificar_banco(path_pdf):
+    """Banco do extrato pelo conteúdo da primeira página ou, em último caso, pelo nome do arquivo"""
+    return banco_pelo_conteudo(path_pdf) or banco_pelo_nome(path_pdf)
@@ -1,45 +1,54 @@
-import pdfplumber
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import re
-import unicodedata
 
-def normalize(text):
-    if not isinstance(text, str):
-        return text
-    return unicodedata.normalize("NFD", text).encode("ascii", "ignore").decode("utf-8").strip()
+from parsers.bancos.extracao import extrair_paginas
+from services.normalizacao import remover_acentos
+from services.valores import texto_para_centavos, valores_em_centavos, tipo_pelo_sinal
 
-def importar_extrato(pdf_path: str) -> pd.DataFrame:
+# Incrementar sempre que a saída do parser mudar (invalida o cache de extratos)
+VERSAO_PARSER = "3"
+
+# Parser só lê o texto das páginas: usa o motor mais rápido
+MOTOR_PDF = "pdfium"
+
+PADRAO_LINHA = re.compile(
+    r"^(\d{2}/\d{2}/\d{4})\s+(.+?)\s+(\d{3,}|[A-Z0-9/]+)?\s+(-?\d{1,3}(?:\.\d{3})*,\d{2})(?:\s+(-?\d{1,3}(?:\.\d{3})*,\d{2}))?$"
+)
+
+def processar_pagina(pagina) -> list:
     lancamentos = []
-    padrao_linha = re.compile(
-        r"^(\d{2}/\d{2}/\d{4})\s+(.+?)\s+(\d{3,}|[A-Z0-9/]+)?\s+(-?\d{1,3}(?:\.\d{3})*,\d{2})(?:\s+(-?\d{1,3}(?:\.\d{3})*,\d{2}))?$"
-    )
-
-    with pdfplumber.open(pdf_path) as pdf:
-        for pagina in pdf.pages:
-            texto = pagina.extract_text()
-            if not texto:
-                continue
-
-            for linha in texto.split('\n'):
-                linha = linha.strip()
-                match = padrao_linha.match(linha)
-                if match:
-                    data_str, historico, documento, valor_str, saldo_str = match.groups()
-                    try:
-                        data = datetime.strptime(data_str, "%d/%m/%Y").date()
-                        valor = float(valor_str.replace(".", "").replace(",", "."))
-                        saldo = float(saldo_str.replace(".", "").replace(",", ".")) if saldo_str else None
-
-                        lancamentos.append({
-                            "data": data,
-                            "historico": normalize(historico),
-                            "documento": documento,
-                            "valor": round(valor, 2),
-                            "saldo": round(saldo, 2) if saldo is not None else None,
-                            "tipo": "C" if valor > 0 else "D"
-                        })
-                    except Exception as e:
-                        print(f"Erro ao processar linha: {linha} -> {e}")
-
-    return pd.DataFrame(lancamentos)
+    texto = pagina.extract_text()
+    if not texto:
+        return lancamentos
+
+    for linha in texto.split('\n'):
+        linha = linha.strip()
+        match = PADRAO_LINHA.match(linha)
+        if match:
+            data_str, historico, documento, valor_str, saldo_str = match.groups()
+            try:
+                data = datetime.strptime(data_str, "%d/%m/%Y").date()
+
+                lancamentos.append({
+                    "data": data,
+                    "historico": remover_acentos(historico),
+                    "documento": documento,
+                    "valor": valor_str,
+                    "saldo": saldo_str,
+                    "tipo": None
+                })
+            except Exception as e:
+                print(f"Erro ao processar linha: {linha} -> {e}")
+    return lancamentos
+
+def importar_extrato(pdf_path: str) -> pd.DataFrame:
+    lancamentos = [linha for pagina in extrair_paginas(pdf_path, processar_pagina, motor=MOTOR_PDF) for linha in pagina]
+
+    df = valores_em_centavos(pd.DataFrame(lancamentos))
+    if "centavos" in df.columns:
+        # Saldo é só informativo: continua em reais
+        df["saldo"] = texto_para_centavos(df["saldo"]).to_numpy(dtype=float, na_value=np.nan) / 100
+        df["tipo"] = tipo_pelo_sinal(df["centavos"])
+    return df
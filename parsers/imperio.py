@@ -1,29 +1,10 @@
 import pandas as pd
-import unicodedata
 from datetime import datetime
-from rapidfuzz import process, fuzz
-
-def normalize_text(text):
-    if not isinstance(text, str):
-        text = str(text)
-    return " ".join(unicodedata.normalize("NFD", text).encode("ascii", "ignore").decode("ascii").lower().split())
-
-def parse_valor(valor):
-    if pd.isna(valor):
-        return 0.0
-    valor = str(valor).strip().replace("R$", "").replace(" ", "")
-    if "." in valor and "," in valor:
-        valor = valor.replace(".", "").replace(",", ".")
-    elif "," in valor:
-        valor = valor.replace(",", ".")
-    elif "." in valor:
-        partes = valor.split(".")
-        if len(partes[-1]) > 2:
-            valor = valor.replace(".", "")
-    try:
-        return float(valor)
-    except:
-        return 0.0
+
+from services.conciliacao import conciliar_por_dia
+from services.fornecedores import carregar_indice, resolver_fornecedores
+from services.normalizacao import normalizar_texto, normalizar_serie
+from services.valores import texto_para_centavos
 
 # Dicionário com contas padrão
 CONTAS_PADRAO = {
@@ -41,158 +22,110 @@ CONTAS_PADRAO = {
     "entrada_credito_padrao": "142"
 }
 
-def importar_arquivo(path_arquivo, conta_corrente, base_path, mapa_depara, tipo):
-    mapa_codigo = {}
-    mapa_nome = {}
-
-    # Carrega base de fornecedores
-    if base_path:
-        df_base = pd.read_excel(base_path) if base_path.endswith(".xlsx") else pd.read_csv(base_path)
-        df_base.columns = [normalize_text(col) for col in df_base.columns]
-        for _, row in df_base.iterrows():
-            nome_original = str(row.get('fornecedor', '')).strip()
-            nome_norm = normalize_text(nome_original)
-            if nome_norm:
-                mapa_codigo[nome_norm] = str(row.get('codigo', ''))
-                mapa_nome[nome_norm] = nome_original
+# Linhas do CSV lidas por vez; limita a memória em relatórios grandes
+TAMANHO_BLOCO = 50_000
+
+COLUNAS_LANCAMENTO = ["data", "descricao", "centavos", "conta_debito", "conta_credito", "tipo", "fornecedor_nome"]
+COLUNAS_CONCILIACAO = ["data", "centavos", "tipo"]
+
+# Diferença do resumo diário por tipo: relatório - bancos nos dois sentidos
+SOMAR_BANCOS = {"D": False, "C": False}
+
+def parse_valor_series(serie):
+    """Valores do relatório em centavos; vazio ou inválido vira 0"""
+    return texto_para_centavos(serie).fillna(0).astype("int64")
+
+def parse_data_series(serie, formato="%Y-%m-%d", estrito=False):
+    datas = pd.to_datetime(serie, format=formato, errors="coerce")
+    falhas = datas.isna() & serie.notna()
+    if not estrito and falhas.any():
+        # Formatos fora do padrão caem no parse elemento a elemento (mesmo resultado do pd.to_datetime escalar)
+        datas = datas.astype("datetime64[ns]")
+        datas[falhas] = pd.to_datetime(serie[falhas].map(lambda v: pd.to_datetime(v, errors="coerce")), errors="coerce")
+    return datas.dt.normalize()
+
+def _coluna(df, nome, padrao=""):
+    if nome in df.columns:
+        return df[nome]
+    return pd.Series(padrao, index=df.index, dtype=object)
+
+def _processar_bloco(df, conta_corrente, mapa_depara, indice):
+    df.columns = [normalizar_texto(col) for col in df.columns]
+    df = df.dropna(subset=[df.columns[0]])
+
+    data_raw = _coluna(df, "datamovimento", padrao=None)
+    valormovimento = parse_valor_series(_coluna(df, "valormovimento", padrao=0))
+
+    # Linhas de movimento vão só para a conciliação
+    movimento = ~(valormovimento == 0)
+    data_conc = parse_data_series(data_raw[movimento], estrito=True)
+    valido = data_conc.notna()
+    conciliacao = pd.DataFrame({
+        "data": data_conc[valido],
+        "centavos": valormovimento[movimento][valido],
+        "tipo": (valormovimento[movimento][valido] > 0).map({True: "C", False: "D"})
+    }, columns=COLUNAS_CONCILIACAO).reset_index(drop=True)
+
+    # Demais linhas (entrada/saída) viram lançamentos
+    df, data_raw = df[~movimento], data_raw[~movimento]
+    valorentrada = parse_valor_series(_coluna(df, "valorentrada", padrao=0))
+    valorsaida = parse_valor_series(_coluna(df, "valorsaida", padrao=0))
+    historico = _coluna(df, "fornecedor_observacao")
+    datas = parse_data_series(data_raw)
+
+    entrada = valorentrada > 0
+    saida = ~entrada & (valorsaida > 0)
+    validos = datas.notna() & historico.notna() & (entrada | saida)
+
+    historico, datas, entrada = historico[validos], datas[validos], entrada[validos]
+    valorentrada, valorsaida = valorentrada[validos], valorsaida[validos]
+
+    hist_norm = normalizar_serie(historico)
+    resolvidos = resolver_fornecedores(hist_norm.unique(), indice, mapa_depara, CONTAS_PADRAO["desconhecido"])
+    fornecedor_nome = hist_norm.map(resolvidos["fornecedor_nome"])
+    deb = hist_norm.map(resolvidos["conta"])
+
+    lancamentos = pd.DataFrame({
+        "data": datas,
+        "descricao": historico.astype(str).str.strip().str.upper(),
+        "centavos": valorentrada.where(entrada, valorsaida),
+        "conta_debito": deb.where(~entrada, conta_corrente),
+        "conta_credito": pd.Series(conta_corrente, index=datas.index, dtype=object).where(~entrada, CONTAS_PADRAO["entrada_credito_padrao"]),
+        "tipo": entrada.map({True: "C", False: "D"}),
+        "fornecedor_nome": fornecedor_nome
+    }, columns=COLUNAS_LANCAMENTO).reset_index(drop=True)
+
+    return lancamentos, conciliacao
+
+def importar_arquivo_em_blocos(path_arquivo, conta_corrente, base_path, mapa_depara, tipo=None, tamanho_bloco=TAMANHO_BLOCO):
+    """Lê o relatório em blocos e devolve (lancamentos, conciliacao) de cada bloco assim que ele é processado"""
+    # Base de fornecedores desta execução
+    indice = carregar_indice(base_path)
 
     # Leitura do relatório (CSV com ; e latin-1)
-    df = pd.read_csv(path_arquivo, delimiter=';', encoding='latin-1', header=0, dtype=str)
-    df.columns = [normalize_text(col) for col in df.columns]
-    df.dropna(subset=[df.columns[0]], inplace=True)
-
-    lancamentos = []
-    conciliacao_movimentos = []
-
-    if not hasattr(importar_arquivo, "cache_fornecedor"):
-        importar_arquivo.cache_fornecedor = {}
-    if not hasattr(importar_arquivo, "fornecedor_index"):
-        importar_arquivo.fornecedor_index = list(mapa_codigo.keys())
-
-    for _, row in df.iterrows():
-        try:
-            data_raw = row.get("datamovimento", "")
-            valormovimento = parse_valor(row.get("valormovimento", 0))
-
-            if isinstance(valormovimento, (int, float)) and valormovimento != 0:
-                data_conc = pd.to_datetime(data_raw, format="%Y-%m-%d", errors="coerce")
-                if not pd.isna(data_conc):
-                    conciliacao_movimentos.append({
-                        "data": data_conc.date(),
-                        "valor": float(valormovimento),
-                        "tipo": "C" if valormovimento > 0 else "D"
-                    })
-                continue
-
-            valorentrada = parse_valor(row.get("valorentrada", 0))
-            valorsaida = parse_valor(row.get("valorsaida", 0))
-            historico = row.get("fornecedor_observacao", "")
-            if not data_raw or (valorentrada == 0 and valorsaida == 0):
-                continue
-
-            data = pd.to_datetime(data_raw, errors="coerce")
-            if pd.isna(data):
-                continue
-            data = data.date()
-
-            hist_norm = normalize_text(historico)
-            cache_key = hist_norm
-
-            if cache_key in importar_arquivo.cache_fornecedor:
-                fornecedor_nome, deb = importar_arquivo.cache_fornecedor[cache_key]
-            else:
-                fornecedor_nome = ""
-                deb = CONTAS_PADRAO["desconhecido"]
-
-                if hist_norm in mapa_depara:
-                    deb = mapa_depara[hist_norm]
-                elif hist_norm in mapa_codigo:
-                    deb = mapa_codigo[hist_norm]
-                    fornecedor_nome = mapa_nome[hist_norm]
-                else:
-                    match = process.extractOne(
-                        hist_norm,
-                        importar_arquivo.fornecedor_index,
-                        scorer=fuzz.ratio,
-                        score_cutoff=85
-                    )
-                    if match:
-                        melhor = match[0]
-                        deb = mapa_codigo[melhor]
-                        fornecedor_nome = mapa_nome[melhor]
-
-                importar_arquivo.cache_fornecedor[cache_key] = (fornecedor_nome, deb)
-
-            if valorentrada > 0:
-                tipo_lanc = "C"
-                valor = valorentrada
-                conta_debito = conta_corrente
-                conta_credito = CONTAS_PADRAO["entrada_credito_padrao"]
-            elif valorsaida > 0:
-                tipo_lanc = "D"
-                valor = valorsaida
-                conta_debito = deb
-                conta_credito = conta_corrente
-            else:
-                continue
-
-            lancamentos.append({
-                "data": data,
-                "descricao": historico.strip().upper(),
-                "valor": float(valor),
-                "conta_debito": conta_debito,
-                "conta_credito": conta_credito,
-                "tipo": tipo_lanc,
-                "fornecedor_nome": fornecedor_nome
-            })
-
-        except Exception as e:
-            continue
-
-    return lancamentos, conciliacao_movimentos
-
-def conciliar_entradas(transacoes_entrada, extrato_banco):
-    if not transacoes_entrada or extrato_banco.empty:
-        return pd.DataFrame()
+    with pd.read_csv(path_arquivo, delimiter=';', encoding='latin-1', header=0, dtype=str, chunksize=tamanho_bloco) as leitor:
+        for bloco in leitor:
+            yield _processar_bloco(bloco, conta_corrente, mapa_depara, indice)
 
-    df_empresa = pd.DataFrame(transacoes_entrada)
-    df_banco = extrato_banco.copy()
+def importar_arquivo(path_arquivo, conta_corrente, base_path, mapa_depara, tipo, ao_processar_bloco=None):
+    lancamentos, conciliacao_movimentos = [], []
 
-    df_empresa["data"] = pd.to_datetime(df_empresa["data"], errors="coerce", dayfirst=True)
-    df_banco["data"] = pd.to_datetime(df_banco["data"], errors="coerce", dayfirst=True)
-    df_empresa = df_empresa.dropna(subset=["data"])
-    df_banco = df_banco.dropna(subset=["data"])
+    for bloco_lancamentos, bloco_conciliacao in importar_arquivo_em_blocos(path_arquivo, conta_corrente, base_path, mapa_depara, tipo):
+        if ao_processar_bloco:
+            ao_processar_bloco(bloco_lancamentos, bloco_conciliacao)
+        lancamentos.append(bloco_lancamentos)
+        conciliacao_movimentos.append(bloco_conciliacao)
 
-    empresa_agg = df_empresa[df_empresa["tipo"] == "C"].groupby("data")["valor"].sum().rename("total_relatorio")
-    banco_agg = df_banco[df_banco["tipo"] == "C"].groupby(["data", "banco"])["valor"].sum().unstack(fill_value=0)
-    banco_agg.columns = [f"{col}_extrato" for col in banco_agg.columns]
+    return _concatenar(lancamentos, COLUNAS_LANCAMENTO), _concatenar(conciliacao_movimentos, COLUNAS_CONCILIACAO)
 
-    resumo = pd.concat([empresa_agg, banco_agg], axis=1).fillna(0)
-    resumo["total_bancos"] = resumo.filter(like="_extrato").sum(axis=1)
-    resumo["diferenca"] = (resumo["total_relatorio"] - resumo["total_bancos"]).round(2)
-    resumo["status_conciliacao"] = resumo["diferenca"].apply(lambda d: "OK" if abs(d) < 0.01 else "Analisar")
+def _concatenar(blocos, colunas):
+    blocos = [b for b in blocos if not b.empty]
+    if not blocos:
+        return pd.DataFrame(columns=colunas)
+    return pd.concat(blocos, ignore_index=True)
 
-    return resumo.reset_index()
+def conciliar_entradas(transacoes_entrada, extrato_banco):
+    return conciliar_por_dia(transacoes_entrada, extrato_banco, "C", SOMAR_BANCOS["C"])
 
 def conciliar_saidas(transacoes_saida, extrato_banco):
-    if not transacoes_saida or extrato_banco.empty:
-        return pd.DataFrame()
-
-    df_empresa = pd.DataFrame(transacoes_saida)
-    df_banco = extrato_banco.copy()
-
-    df_empresa["data"] = pd.to_datetime(df_empresa["data"], errors="coerce", dayfirst=True)
-    df_banco["data"] = pd.to_datetime(df_banco["data"], errors="coerce", dayfirst=True)
-    df_empresa = df_empresa.dropna(subset=["data"])
-    df_banco = df_banco.dropna(subset=["data"])
-
-    empresa_agg = df_empresa[df_empresa["tipo"] == "D"].groupby("data")["valor"].sum().rename("total_relatorio")
-    banco_agg = df_banco[df_banco["tipo"] == "D"].groupby(["data", "banco"])["valor"].sum().unstack(fill_value=0)
-    banco_agg.columns = [f"{col}_extrato" for col in banco_agg.columns]
-
-    resumo = pd.concat([empresa_agg, banco_agg], axis=1).fillna(0)
-    resumo["total_bancos"] = resumo.filter(like="_extrato").sum(axis=1)
-    resumo["diferenca"] = (resumo["total_relatorio"] - resumo["total_bancos"]).round(2)
-    resumo["status_conciliacao"] = resumo["diferenca"].apply(lambda d: "OK" if abs(d) < 0.01 else "Analisar")
-
-    return resumo.reset_index()
\ No newline at end of file
+    return conciliar_por_dia(transacoes_saida, extrato_banco, "D", SOMAR_BANCOS["D"])
\ No newline at end of file
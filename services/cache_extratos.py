@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import pandas as pd
+
+from parsers.bancos.extracao import motor_do_parser
+from services.config import caminho_cache
+from services.rastreamento import etapa
+
+# Limites do cache de extratos; o que passar disso é removido (mais antigos primeiro)
+LIMITE_BYTES = 512 * 1024 * 1024
+IDADE_MAXIMA_DIAS = 90
+
+
+def hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _pasta_extratos():
+    pasta = os.path.join(caminho_cache(), "extratos")
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def chave_extrato(caminho_pdf, nome_parser, versao_parser, parametros=None, motor=None):
+    partes = {
+        "arquivo": hash_arquivo(caminho_pdf),
+        "parser": nome_parser,
+        "versao": str(versao_parser),
+        "motor": motor,
+        "parametros": parametros or {},
+    }
+    return hashlib.sha256(json.dumps(partes, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def limpar_cache(limite_bytes=LIMITE_BYTES, idade_maxima_dias=IDADE_MAXIMA_DIAS):
+    pasta = _pasta_extratos()
+    agora = time.time()
+    entradas = []
+    for nome in os.listdir(pasta):
+        caminho = os.path.join(pasta, nome)
+        try:
+            info = os.stat(caminho)
+        except OSError:
+            continue
+        if agora - info.st_mtime > idade_maxima_dias * 86400:
+            _remover(caminho)
+        else:
+            entradas.append((info.st_mtime, info.st_size, caminho))
+
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= limite_bytes:
+            break
+        _remover(caminho)
+        total -= tamanho
+
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+def carregar_extrato_cacheado(parser_banco, nome_parser, caminho_pdf, **parametros):
+    """Executa parser_banco.importar_extrato reaproveitando o resultado salvo para o mesmo PDF.
+
+    A chave é o hash do conteúdo do arquivo + nome, VERSAO_PARSER e motor de PDF do parser, então
+    renomear ou copiar o PDF continua acertando o cache e mudar o parser (ou o HMPX_MOTOR_PDF) o invalida.
+    """
+    versao = getattr(parser_banco, "VERSAO_PARSER", "0")
+    try:
+        chave = chave_extrato(caminho_pdf, nome_parser, versao, parametros, motor_do_parser(parser_banco))
+        arquivo_cache = os.path.join(_pasta_extratos(), f"{chave}.parquet")
+    except OSError as e:
+        print(f"[CACHE] Cache indisponível: {e}")
+        return parser_banco.importar_extrato(caminho_pdf, **parametros)
+
+    if os.path.exists(arquivo_cache):
+        try:
+            with etapa("ler_cache") as registro:
+                df = pd.read_parquet(arquivo_cache)
+                registro["linhas"] = len(df)
+            os.utime(arquivo_cache)  # marca como usado recentemente
+            return df
+        except Exception as e:
+            print(f"[CACHE] Entrada inválida, reprocessando: {e}")
+            _remover(arquivo_cache)
+
+    with etapa("ler_pdf", parser=nome_parser) as registro:
+        df = parser_banco.importar_extrato(caminho_pdf, **parametros)
+        registro["linhas"] = len(df)
+
+    try:
+        # Nome próprio por thread: o mesmo PDF pode estar sendo importado duas vezes ao mesmo tempo
+        temporario = f"{arquivo_cache}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_parquet(temporario, index=False)
+        os.replace(temporario, arquivo_cache)
+        limpar_cache()
+    except Exception as e:
+        print(f"[CACHE] Não foi possível gravar o cache: {e}")
+    return df
@@ -0,0 +1,105 @@
+import os
+import re
+import json
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from services.config import recurso_path
+
+CAMINHO_REGRAS = "config/categorias.json"
+
+
+def ler_config(caminho_relativo):
+    """JSON de config/; rodando de outra pasta (ex: linha de comando), usa o arquivo que acompanha o código"""
+    caminho = recurso_path(caminho_relativo)
+    if not os.path.exists(caminho):
+        caminho = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), caminho_relativo)
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def carregar_regras(caminho=None):
+    """(regras, categoria padrão) do arquivo de configuração; a ordem das regras é a prioridade"""
+    if caminho is None:
+        dados = ler_config(CAMINHO_REGRAS)
+    else:
+        with open(caminho, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+    return dados["regras"], dados.get("padrao", "Outros")
+
+
+def _alternativas(regra):
+    """Termos aparecem em qualquer ponto do texto; palavras só inteiras (ex: "ted" não casa com "conteudo")"""
+    partes = [re.escape(termo.lower()) for termo in regra.get("termos", [])]
+    partes += [rf"\b{re.escape(palavra.lower())}\b" for palavra in regra.get("palavras", [])]
+    if not partes:
+        raise ValueError(f"Regra de categoria sem termos: {regra.get('categoria')}")
+    return "|".join(partes)
+
+
+def compilar(regras):
+    """Uma regex só para todas as regras, com um grupo por regra.
+
+    Cada regra vira um lookahead ancorado no início do texto (\\A) e a alternação tenta as regras na
+    ordem: ganha a primeira regra que aparecer em qualquer ponto, não a que aparecer mais à esquerda.
+    Sem a âncora, um texto que não casa seria varrido de novo a partir de cada posição.
+    """
+    alternativas = "|".join(f"(?=.*?({_alternativas(regra)}))" for regra in regras)
+    return re.compile(rf"\A(?:{alternativas})", re.DOTALL)
+
+
+def primeira_regra(expressao, textos):
+    """Índice da primeira regra de compilar() que casa com cada texto (em minúsculas); nº de regras se nenhuma.
+
+    A regex roda uma vez por texto distinto.
+    """
+    serie = pd.Series(textos, dtype=object)
+    if serie.empty:
+        return np.zeros(0, dtype=np.intp)
+    codigos, distintos = pd.factorize(serie.fillna("").astype(str).str.lower())
+    casou = pd.Series(distintos, dtype=object).str.extract(expressao).notna().to_numpy()
+    return np.where(casou.any(axis=1), casou.argmax(axis=1), expressao.groups)[codigos]
+
+
+class Categorizador:
+    """Categoria de cada histórico pelas regras de config/categorias.json.
+
+    contagem acumula quantas linhas cada categoria (a padrão inclusive) já recebeu; cada
+    SessaoConciliacao tem o seu e o zera a cada processar (ver contagem_categorias).
+    """
+
+    def __init__(self, regras=None, padrao="Outros"):
+        if regras is None:
+            regras, padrao = carregar_regras()
+        self.categorias = [regra["categoria"] for regra in regras]
+        self.padrao = padrao
+        self.expressao = compilar(regras)
+        self.contagem = Counter()
+        self._trava = threading.Lock()
+
+    def categorizar(self, historicos):
+        """Categoria de cada linha; a regex roda uma vez por histórico distinto"""
+        serie = pd.Series(historicos, dtype=object)
+        regra = primeira_regra(self.expressao, serie)
+
+        nomes = np.array(self.categorias + [self.padrao], dtype=object)
+        acertos = np.bincount(regra, minlength=len(nomes))
+        with self._trava:
+            for nome, quantidade in zip(nomes, acertos):
+                if quantidade:
+                    self.contagem[nome] += int(quantidade)
+        return pd.Series(nomes[regra], index=serie.index)
+
+
+_categorizador = None
+
+
+def categorizador_padrao():
+    """Categorizador com as regras do arquivo de configuração, compilado no primeiro uso"""
+    global _categorizador
+    if _categorizador is None:
+        _categorizador = Categorizador()
+    return _categorizador
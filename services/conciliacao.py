@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+
+# Tipo do lançamento (D/C) e o nome usado nas colunas do resumo diário
+DIRECOES = {"D": "debitos", "C": "creditos"}
+
+RELATORIO, EXTRATO = "relatorio", "extrato"
+
+
+def agregar(df, por_banco=False):
+    """Soma em centavos e nº de linhas de um arquivo por (data, banco, tipo).
+
+    Datas inválidas ficam com data None (contam linhas, mas não entram nos totais por dia);
+    sem por_banco (relatórios) o banco fica None.
+    """
+    if df is None or len(df) == 0:
+        return {}
+    datas = pd.to_datetime(df["data"], errors="coerce", dayfirst=True)
+    if "centavos" in df.columns:
+        centavos = df["centavos"].to_numpy(dtype=np.int64)
+    else:
+        valores = pd.to_numeric(df["valor"], errors="coerce").fillna(0).to_numpy(dtype=float)
+        centavos = np.rint(valores * 100).astype(np.int64)
+    chaves = pd.DataFrame({
+        "data": datas.to_numpy(),
+        "banco": df["banco"].astype(str).to_numpy() if por_banco else None,
+        "tipo": df["tipo"].to_numpy(dtype=object),
+        "centavos": centavos,
+    })
+    somas = chaves.groupby(["data", "banco", "tipo"], dropna=False)["centavos"].agg(["sum", "size"])
+
+    agregado = {}
+    for (data, banco, tipo), (centavos, linhas) in zip(somas.index, somas.to_numpy()):
+        chave = (None if pd.isna(data) else data, None if pd.isna(banco) else banco, None if pd.isna(tipo) else tipo)
+        agregado[chave] = (int(centavos), int(linhas))
+    return agregado
+
+
+def _somar(totais, agregado, sinal=1):
+    """Soma (ou, com sinal=-1, desconta) o agregado de um arquivo; só as chaves dele são tocadas"""
+    for chave, (centavos, linhas) in agregado.items():
+        atual_centavos, atual_linhas = totais.get(chave, (0, 0))
+        atual_linhas += sinal * linhas
+        if atual_linhas:
+            totais[chave] = (atual_centavos + sinal * centavos, atual_linhas)
+        else:
+            totais.pop(chave, None)
+
+
+def _no_periodo(data, periodo):
+    if not periodo:
+        return True
+    return data is not None and data.strftime("%Y-%m") == periodo
+
+
+def montar_resumo(total_relatorio, extrato_por_banco, somar_bancos=False):
+    """Resumo da conciliação por dia: total do relatório, total de cada banco e a diferença.
+
+    total_relatorio: série por data; extrato_por_banco: série por (data, banco). Com somar_bancos
+    a diferença é relatório + bancos (extratos que trazem os débitos com sinal negativo).
+    """
+    banco_agg = extrato_por_banco.unstack(fill_value=0)
+    banco_agg.columns = [f"{col}_extrato" for col in banco_agg.columns]
+
+    resumo = pd.concat([total_relatorio.rename("total_relatorio"), banco_agg], axis=1).fillna(0)
+    resumo["total_bancos"] = resumo.filter(like="_extrato").sum(axis=1)
+    if somar_bancos:
+        diferenca = resumo["total_bancos"] + resumo["total_relatorio"]
+    else:
+        diferenca = resumo["total_relatorio"] - resumo["total_bancos"]
+    resumo["diferenca"] = diferenca.round(2)
+    resumo["status_conciliacao"] = resumo["diferenca"].apply(lambda d: "OK" if abs(d) < 0.01 else "Analisar")
+
+    return resumo.reset_index()
+
+
+def conciliar_por_dia(transacoes, extrato_banco, tipo, somar_bancos=False):
+    """Resumo diário de um tipo (D/C) a partir dos lançamentos do relatório e do extrato inteiros"""
+    if len(transacoes) == 0 or extrato_banco.empty:
+        return pd.DataFrame()
+    agregados = AgregadosConciliacao()
+    agregados.adicionar(RELATORIO, RELATORIO, pd.DataFrame(transacoes))
+    agregados.adicionar(EXTRATO, EXTRATO, extrato_banco)
+    return agregados.resumo_conciliacao(tipo, somar_bancos=somar_bancos)
+
+
+class AgregadosConciliacao:
+    """Totais por dia, banco e tipo dos relatórios e extratos importados.
+
+    Cada arquivo entra (ou sai) somando (ou descontando) só as próprias chaves, em centavos,
+    então o resumo de conciliação e o resumo diário não dependem de reagrupar tudo a cada arquivo.
+    """
+
+    def __init__(self):
+        self._fontes = {}
+        self._totais = {RELATORIO: {}, EXTRATO: {}}
+
+    def adicionar(self, chave, origem, df):
+        """Acrescenta as linhas de df ao arquivo chave (relatórios chegam em blocos)"""
+        agregado = agregar(df, por_banco=origem == EXTRATO)
+        _, acumulado = self._fontes.setdefault(chave, (origem, {}))
+        _somar(acumulado, agregado)
+        _somar(self._totais[origem], agregado)
+
+    def remover(self, chave):
+        if chave not in self._fontes:
+            return False
+        origem, agregado = self._fontes.pop(chave)
+        _somar(self._totais[origem], agregado, -1)
+        return True
+
+    def linhas(self, origem, tipo=None, periodo=None):
+        return sum(
+            linhas for (data, _, t), (_, linhas) in self._totais[origem].items()
+            if (tipo is None or t == tipo) and _no_periodo(data, periodo)
+        )
+
+    def _por_dia(self, totais, tipo, periodo, por_banco):
+        """Série em reais por data (ou por data e banco) das chaves do tipo no período"""
+        chaves, valores = [], []
+        for (data, banco, t), (centavos, _) in totais.items():
+            if t == tipo and data is not None and _no_periodo(data, periodo):
+                chaves.append((data, banco) if por_banco else data)
+                valores.append(centavos / 100)
+        if por_banco:
+            indice = pd.MultiIndex.from_tuples(chaves, names=["data", "banco"]) if chaves else \
+                pd.MultiIndex.from_arrays([pd.DatetimeIndex([]), []], names=["data", "banco"])
+        else:
+            indice = pd.DatetimeIndex(chaves, name="data")
+        return pd.Series(valores, index=indice, dtype=float).sort_index()
+
+    def resumo_conciliacao(self, tipo, periodo=None, somar_bancos=False, descontar=None):
+        """Mesmo resultado de conciliar_saidas/conciliar_entradas dos parsers, a partir dos totais.
+
+        descontar: linhas do extrato que ficam de fora (ex: transferências entre contas da empresa).
+        """
+        extrato = self._totais[EXTRATO]
+        if descontar is not None and len(descontar):
+            extrato = dict(extrato)
+            _somar(extrato, agregar(descontar, por_banco=True), -1)
+
+        linhas_extrato = sum(linhas for (data, _, _), (_, linhas) in extrato.items() if _no_periodo(data, periodo))
+        if not self.linhas(RELATORIO, tipo, periodo) or not linhas_extrato:
+            return pd.DataFrame()
+        return montar_resumo(
+            self._por_dia(self._totais[RELATORIO], tipo, periodo, por_banco=False),
+            self._por_dia(extrato, tipo, periodo, por_banco=True),
+            somar_bancos,
+        )
+
+    def resumo_diario(self, periodo=None):
+        """Uma linha por dia: débitos e créditos do relatório e de cada banco, em reais"""
+        colunas = {}
+        for origem, totais in self._totais.items():
+            for (data, banco, tipo), (centavos, _) in totais.items():
+                if data is None or tipo not in DIRECOES or not _no_periodo(data, periodo):
+                    continue
+                coluna = f"{banco if origem == EXTRATO else RELATORIO}_{DIRECOES[tipo]}"
+                colunas.setdefault(coluna, {})[data] = centavos / 100
+        if not colunas:
+            return pd.DataFrame()
+        resumo = pd.DataFrame(colunas).fillna(0).sort_index()
+        resumo = resumo[sorted(resumo.columns, key=lambda c: (not c.startswith(RELATORIO), c))]
+        resumo.index.name = "data"
+        return resumo.reset_index()
@@ -15,4 +15,53 @@ def caminho_area_de_trabalho():
 def carregar_empresa(caminho_config):
     with open(caminho_config, "r", encoding="utf-8") as f:
         dados = json.load(f)
-    return {config["nome"]: id_ for id_, config in dados.items()}
\ No newline at end of file
+    return {config["nome"]: id_ for id_, config in dados.items()}
+
+def workers_extracao_pdf():
+    """Quantidade de processos usados para extrair as páginas dos PDFs (0 ou 1 = sequencial)"""
+    valor = os.environ.get("HMPX_WORKERS_PDF", "").strip()
+    if valor:
+        try:
+            return max(0, int(valor))
+        except ValueError:
+            print(f"[CONFIG] HMPX_WORKERS_PDF inválido: {valor!r}")
+    return min(4, os.cpu_count() or 1)
+
+
+def workers_importacao():
+    """Arquivos (relatórios e extratos) lidos ao mesmo tempo ao importar vários de uma vez"""
+    valor = os.environ.get("HMPX_WORKERS_IMPORTACAO", "").strip()
+    if valor:
+        try:
+            return max(1, int(valor))
+        except ValueError:
+            print(f"[CONFIG] HMPX_WORKERS_IMPORTACAO inválido: {valor!r}")
+    return min(4, os.cpu_count() or 1)
+
+
+def motor_extracao_pdf(padrao):
+    """Motor dos bancos que leem só o texto do PDF; HMPX_MOTOR_PDF=pdfplumber volta todos ao pdfplumber"""
+    return os.environ.get("HMPX_MOTOR_PDF", "").strip().lower() or padrao
+
+
+def caminho_cache():
+    """Pasta local usada para os caches (extratos já processados etc.)"""
+    base = os.environ.get("HMPX_CACHE_DIR") or os.path.join(
+        os.environ.get("LOCALAPPDATA", str(Path.home())), "HMPX", "cache"
+    )
+    os.makedirs(base, exist_ok=True)
+    return base
+
+
+def caminho_rastreamento():
+    """Pasta dos rastros de execução (tempos por etapa e perfis do cProfile)"""
+    base = os.environ.get("HMPX_TRACE_DIR") or os.path.join(
+        os.environ.get("LOCALAPPDATA", str(Path.home())), "HMPX", "rastreamento"
+    )
+    os.makedirs(base, exist_ok=True)
+    return base
+
+
+def perfil_ativo():
+    """HMPX_PROFILE=1 grava também o perfil do cProfile de cada execução"""
+    return os.environ.get("HMPX_PROFILE", "").strip().lower() in ("1", "true", "sim")
@@ -1,28 +1,192 @@
+import os
+import hashlib
+import sqlite3
+from contextlib import contextmanager
 import pandas as pd
-import unicodedata
-
-def normalize_text(text):
-    if not isinstance(text, str):
-        text = str(text)
-    return " ".join(
-        unicodedata.normalize("NFD", text)
-        .encode("ascii", "ignore")
-        .decode("ascii")
-        .lower()
-        .split()
+from datetime import datetime
+
+from services.config import caminho_cache
+from services.normalizacao import normalizar_texto
+from services.saida import gravar_xlsx
+
+def caminho_banco_depara(caminho_depara):
+    """Banco local de cada planilha (pasta de cache): SQLite num compartilhamento de rede não trava direito.
+
+    A planilha continua sendo o que é compartilhado; o banco só é lido e gravado nesta máquina.
+    """
+    pasta = os.path.join(caminho_cache(), "depara")
+    os.makedirs(pasta, exist_ok=True)
+    nome = os.path.splitext(os.path.basename(caminho_depara))[0]
+    origem = hashlib.sha1(os.path.abspath(caminho_depara).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(pasta, f"{nome}-{origem}.db")
+
+@contextmanager
+def abrir_depara(caminho_depara):
+    """Conexão com o banco do DE-PARA; confirma ao sair sem erro e sempre fecha o arquivo"""
+    conn = sqlite3.connect(caminho_banco_depara(caminho_depara), timeout=30)
+    try:
+        _criar_tabelas(conn)
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _criar_tabelas(conn):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS depara (
+            nome_normalizado TEXT PRIMARY KEY,
+            nome TEXT NOT NULL,
+            codigo TEXT NOT NULL,
+            atualizado_em TEXT NOT NULL,
+            exportado INTEGER NOT NULL DEFAULT 1
+        );
+        CREATE TABLE IF NOT EXISTS sincronizacao (
+            origem TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            tamanho INTEGER NOT NULL
+        );
+    """)
+    # Bancos criados antes da coluna exportado: tudo o que já estava lá veio da planilha
+    if "exportado" not in {coluna[1] for coluna in conn.execute("PRAGMA table_info(depara)")}:
+        conn.execute("ALTER TABLE depara ADD COLUMN exportado INTEGER NOT NULL DEFAULT 1")
+
+def _limpar_codigo(codigo):
+    codigo = str(codigo).strip()
+    return codigo[:-2] if codigo.endswith(".0") else codigo
+
+def _registros_excel(caminho_excel):
+    df = pd.read_excel(caminho_excel)
+    df.columns = [str(col).strip().lower() for col in df.columns]
+    df = df.dropna(subset=["nome", "codigo"])
+    for nome, codigo in zip(df["nome"], df["codigo"]):
+        nome = str(nome).strip()
+        chave = normalizar_texto(nome)
+        if chave:
+            yield chave, nome, _limpar_codigo(codigo)
+
+# Alteração feita no banco (tela do DE-PARA): fica marcada até ser exportada para a planilha
+_SQL_UPSERT = """
+    INSERT INTO depara (nome_normalizado, nome, codigo, atualizado_em, exportado) VALUES (?, ?, ?, ?, 0)
+    ON CONFLICT(nome_normalizado) DO UPDATE SET
+        nome = excluded.nome, codigo = excluded.codigo, atualizado_em = excluded.atualizado_em, exportado = 0
+"""
+
+# Linhas da planilha (tabela temporária): só substituem registros já exportados, e só se mudaram
+_SQL_MESCLAR = """
+    INSERT INTO depara (nome_normalizado, nome, codigo, atualizado_em, exportado)
+    SELECT nome_normalizado, nome, codigo, ?, 1 FROM planilha WHERE true
+    ON CONFLICT(nome_normalizado) DO UPDATE SET
+        nome = excluded.nome, codigo = excluded.codigo, atualizado_em = excluded.atualizado_em
+    WHERE depara.exportado AND (depara.nome IS NOT excluded.nome OR depara.codigo IS NOT excluded.codigo)
+"""
+
+def _agora():
+    return datetime.now().isoformat(timespec="seconds")
+
+def _pendentes(conn):
+    return conn.execute("SELECT COUNT(*) FROM depara WHERE NOT exportado").fetchone()[0]
+
+def _marcar_sincronizado(conn, caminho_excel):
+    info = os.stat(caminho_excel)
+    conn.execute(
+        "INSERT OR REPLACE INTO sincronizacao (origem, mtime_ns, tamanho) VALUES (?, ?, ?)",
+        (os.path.abspath(caminho_excel), info.st_mtime_ns, info.st_size)
     )
 
+def _ultima_sincronizacao(conn, caminho_excel):
+    return conn.execute(
+        "SELECT mtime_ns, tamanho FROM sincronizacao WHERE origem = ?", (os.path.abspath(caminho_excel),)
+    ).fetchone()
+
+def _excel_alterado(conn, caminho_excel):
+    if not os.path.exists(caminho_excel):
+        return False
+    info = os.stat(caminho_excel)
+    return _ultima_sincronizacao(conn, caminho_excel) != (info.st_mtime_ns, info.st_size)
+
+def importar_depara_excel(caminho_depara, caminho_excel=None):
+    """Traz a planilha para o banco: a planilha vale, inclusive para os nomes que saíram dela.
+
+    A exceção são os registros alterados no banco e ainda não exportados, que são mantidos e
+    gravados de volta na planilha. Na primeira carga de uma planilha nada é apagado do banco.
+    """
+    caminho_excel = caminho_excel or caminho_depara
+    with abrir_depara(caminho_depara) as conn:
+        primeira_carga = _ultima_sincronizacao(conn, caminho_excel) is None
+        conn.execute(
+            "CREATE TEMP TABLE planilha (nome_normalizado TEXT PRIMARY KEY, nome TEXT NOT NULL, codigo TEXT NOT NULL)"
+        )
+        conn.executemany("INSERT OR REPLACE INTO planilha VALUES (?, ?, ?)", _registros_excel(caminho_excel))
+        conn.execute(_SQL_MESCLAR, (_agora(),))
+        if not primeira_carga:
+            conn.execute(
+                "DELETE FROM depara WHERE exportado AND nome_normalizado NOT IN (SELECT nome_normalizado FROM planilha)"
+            )
+        conn.execute("DROP TABLE planilha")
+        _marcar_sincronizado(conn, caminho_excel)
+        pendentes = _pendentes(conn)
+        total = conn.execute("SELECT COUNT(*) FROM depara").fetchone()[0]
+    if pendentes:
+        exportar_depara_excel(caminho_depara, caminho_excel)
+    return total
+
+def exportar_depara_excel(caminho_depara, caminho_excel=None):
+    """Grava o banco no layout da planilha original (colunas nome, codigo)"""
+    caminho_excel = caminho_excel or caminho_depara
+    with abrir_depara(caminho_depara) as conn:
+        # Segura o banco até a planilha estar gravada: nada alterado no meio fica marcado como exportado
+        conn.execute("BEGIN IMMEDIATE")
+        df = pd.read_sql_query("SELECT nome, codigo FROM depara ORDER BY nome", conn)
+        gravar_xlsx(caminho_excel, {"Sheet1": df})
+        conn.execute("UPDATE depara SET exportado = 1 WHERE NOT exportado")
+        _marcar_sincronizado(conn, caminho_excel)
+    return caminho_excel
+
+def exportar_pendentes_depara(caminho_depara):
+    """Exporta a planilha só se houver alterações do banco ainda fora dela; devolve quantas eram"""
+    with abrir_depara(caminho_depara) as conn:
+        pendentes = _pendentes(conn)
+    if pendentes:
+        exportar_depara_excel(caminho_depara)
+    return pendentes
+
+def upsert_depara(caminho_depara, nome, codigo):
+    nome = str(nome).strip()
+    chave = normalizar_texto(nome)
+    if not chave:
+        raise ValueError("Nome do fornecedor vazio.")
+    with abrir_depara(caminho_depara) as conn:
+        conn.execute(_SQL_UPSERT, (chave, nome, _limpar_codigo(codigo), _agora()))
+
+def listar_depara(caminho_depara):
+    with abrir_depara(caminho_depara) as conn:
+        return pd.read_sql_query("SELECT nome, codigo FROM depara ORDER BY nome", conn)
+
+def sincronizar_depara(caminho_depara):
+    """Importa a planilha para o banco se ela mudou desde a última sincronização.
+
+    As alterações do banco não exportadas só vão para a planilha junto com essa importação
+    (ou por exportar_depara_excel / exportar_pendentes_depara): incluir um registro não regrava a planilha.
+    """
+    with abrir_depara(caminho_depara) as conn:
+        alterado = _excel_alterado(conn, caminho_depara)
+    if alterado:
+        importar_depara_excel(caminho_depara)
+
 def carregar_depara(caminho_depara):
     mapa = {}
 
     try:
-        df = pd.read_excel(caminho_depara)
-        df.columns = [col.strip().lower() for col in df.columns]
-        for _, row in df.iterrows():
-            nome = str(row["nome"]).strip().lower()
-            codigo = str(row["codigo"])
-            nome_normalizado = normalize_text(nome)
-            mapa[nome_normalizado] = codigo
+        sincronizar_depara(caminho_depara)
+    except Exception as e:
+        # Planilha inacessível (ex: compartilhamento fora do ar): usa o que já está no banco
+        print(f"[DEPARA] Erro ao sincronizar DE-PARA com a planilha: {e}")
+    try:
+        with abrir_depara(caminho_depara) as conn:
+            mapa = dict(conn.execute("SELECT nome_normalizado, codigo FROM depara"))
     except Exception as e:
               print(f"[DEPARA] Erro ao carregar DE-PARA: {e}")
-    return mapa 
\ No newline at end of file
+    return mapa
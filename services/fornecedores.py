@@ -0,0 +1,219 @@
+import os
+import json
+import zlib
+import struct
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from rapidfuzz import process, fuzz
+
+from services.normalizacao import normalizar_texto
+from services.rastreamento import etapa
+
+SCORE_MINIMO = 85
+# Nomes comparados por chamada do cdist (limita a matriz nomes x base em memória)
+TAMANHO_LOTE = 256
+# Quantas versões de índice mantêm resultados no cache
+VERSOES_EM_CACHE = 4
+
+# Índice compilado gravado ao lado da planilha (Base_Fornecedores.xlsx -> Base_Fornecedores.idx)
+EXTENSAO_INDICE = ".idx"
+ASSINATURA_INDICE = b"HMPXIDX1"
+SEPARADOR_CAMPO, SEPARADOR_REGISTRO = "\x1f", "\x1e"
+
+_cache_semelhantes = OrderedDict()
+# Índices já carregados nesta sessão: caminho -> (mtime_ns, tamanho, índice)
+_indices_carregados = {}
+# Relatórios importados em paralelo compartilham os caches acima
+_trava = threading.RLock()
+
+
+class IndiceFornecedores:
+    """Base de fornecedores de uma execução: chave normalizada -> código contábil e nome original"""
+
+    def __init__(self, chaves=(), codigos=(), nomes=()):
+        self.chaves = list(chaves)
+        self.codigos = list(codigos)
+        self.nomes = list(nomes)
+        self.posicao = {chave: i for i, chave in enumerate(self.chaves)}
+        conteudo = "\n".join(f"{c}\t{k}\t{n}" for c, k, n in zip(self.chaves, self.codigos, self.nomes))
+        self.versao = hashlib.sha1(conteudo.encode("utf-8")).hexdigest()
+
+    def __len__(self):
+        return len(self.chaves)
+
+    @classmethod
+    def do_dataframe(cls, df_base):
+        df_base = df_base.copy()
+        df_base.columns = [normalizar_texto(col) for col in df_base.columns]
+        nomes = df_base["fornecedor"].astype(str).str.strip() if "fornecedor" in df_base.columns else pd.Series("", index=df_base.index)
+        codigos = df_base["codigo"].astype(str) if "codigo" in df_base.columns else pd.Series("", index=df_base.index)
+
+        # Chave repetida fica com o código/nome da última linha, na posição da primeira
+        mapa = {}
+        for nome_original, codigo in zip(nomes, codigos):
+            chave = normalizar_texto(nome_original)
+            if chave:
+                mapa[chave] = (codigo, nome_original)
+        return cls(mapa.keys(), [c for c, _ in mapa.values()], [n for _, n in mapa.values()])
+
+    @classmethod
+    def da_base(cls, base_path):
+        if not base_path:
+            return cls()
+        df_base = pd.read_excel(base_path) if base_path.endswith(".xlsx") else pd.read_csv(base_path)
+        return cls.do_dataframe(df_base)
+
+
+def _hash_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def gravar_indice_compilado(caminho_indice, indice, origem):
+    """Formato: assinatura + tamanho do cabeçalho + cabeçalho JSON + registros chave/codigo/nome com zlib"""
+    cabecalho = json.dumps(origem).encode("utf-8")
+    linhas = SEPARADOR_REGISTRO.join(
+        SEPARADOR_CAMPO.join(campos) for campos in zip(indice.chaves, indice.codigos, indice.nomes)
+    )
+    temporario = caminho_indice + ".tmp"
+    with open(temporario, "wb") as f:
+        f.write(ASSINATURA_INDICE)
+        f.write(struct.pack("<I", len(cabecalho)))
+        f.write(cabecalho)
+        f.write(zlib.compress(linhas.encode("utf-8"), 6))
+    os.replace(temporario, caminho_indice)
+
+
+def ler_indice_compilado(caminho_indice):
+    """Devolve (cabeçalho, índice) ou (None, None) se o arquivo não existir ou for inválido"""
+    try:
+        with open(caminho_indice, "rb") as f:
+            if f.read(len(ASSINATURA_INDICE)) != ASSINATURA_INDICE:
+                return None, None
+            (tamanho,) = struct.unpack("<I", f.read(4))
+            cabecalho = json.loads(f.read(tamanho).decode("utf-8"))
+            conteudo = zlib.decompress(f.read()).decode("utf-8")
+    except (OSError, ValueError, struct.error, zlib.error):
+        return None, None
+
+    registros = [linha.split(SEPARADOR_CAMPO) for linha in conteudo.split(SEPARADOR_REGISTRO)] if conteudo else []
+    return cabecalho, IndiceFornecedores(*zip(*registros)) if registros else IndiceFornecedores()
+
+
+def carregar_indice(base_path):
+    """Índice da base de fornecedores, lido uma vez por sessão.
+
+    Usa o .idx ao lado da planilha enquanto o mtime/tamanho (ou, se mudaram, o hash) da
+    planilha baterem com os gravados nele; caso contrário recompila a partir da planilha.
+    """
+    if not base_path:
+        return IndiceFornecedores()
+    with _trava:
+        return _carregar_indice(base_path)
+
+
+def _carregar_indice(base_path):
+    info = os.stat(base_path)
+    memorizado = _indices_carregados.get(base_path)
+    if memorizado and memorizado[:2] == (info.st_mtime_ns, info.st_size):
+        return memorizado[2]
+
+    caminho_indice = os.path.splitext(base_path)[0] + EXTENSAO_INDICE
+    origem = {"mtime_ns": info.st_mtime_ns, "tamanho": info.st_size}
+    cabecalho, indice = ler_indice_compilado(caminho_indice)
+
+    valido = cabecalho is not None and cabecalho.get("mtime_ns") == info.st_mtime_ns and cabecalho.get("tamanho") == info.st_size
+    if not valido:
+        origem["sha256"] = _hash_arquivo(base_path)
+        # Planilha só "tocada" (copiada, sincronizada): conteúdo igual, basta atualizar o cabeçalho
+        valido = cabecalho is not None and cabecalho.get("sha256") == origem["sha256"]
+        if not valido:
+            indice = IndiceFornecedores.da_base(base_path)
+        try:
+            gravar_indice_compilado(caminho_indice, indice, origem)
+        except OSError as e:
+            print(f"[FORNECEDORES] Não foi possível gravar o índice compilado: {e}")
+
+    _indices_carregados[base_path] = (info.st_mtime_ns, info.st_size, indice)
+    return indice
+
+
+def _cache_da_versao(versao):
+    with _trava:
+        if versao in _cache_semelhantes:
+            _cache_semelhantes.move_to_end(versao)
+        else:
+            _cache_semelhantes[versao] = {}
+            while len(_cache_semelhantes) > VERSOES_EM_CACHE:
+                _cache_semelhantes.popitem(last=False)
+        return _cache_semelhantes[versao]
+
+
+def buscar_semelhantes(nomes, indice, score_minimo=SCORE_MINIMO, workers=-1):
+    """Melhor chave da base e score para cada nome, comparando todos os nomes distintos de uma vez.
+
+    Devolve {nome: (chave ou None, score)}. Empates ficam com a primeira chave da base,
+    como no process.extractOne.
+    """
+    cache = _cache_da_versao(indice.versao)
+    pendentes = [nome for nome in dict.fromkeys(nomes) if nome not in cache]
+
+    if not len(indice):
+        cache.update({nome: (None, 0.0) for nome in pendentes})
+        pendentes = []
+
+    for inicio in range(0, len(pendentes), TAMANHO_LOTE):
+        lote = pendentes[inicio:inicio + TAMANHO_LOTE]
+        scores = process.cdist(
+            lote,
+            indice.chaves,
+            scorer=fuzz.ratio,
+            score_cutoff=score_minimo,
+            dtype=np.float64,
+            workers=workers
+        )
+        melhores = scores.argmax(axis=1)
+        melhores_scores = scores[np.arange(len(lote)), melhores]
+        for nome, posicao, score in zip(lote, melhores, melhores_scores):
+            cache[nome] = (indice.chaves[posicao], float(score)) if score >= score_minimo and score > 0 else (None, 0.0)
+
+    return {nome: cache[nome] for nome in nomes}
+
+
+def resolver_fornecedores(nomes, indice, mapa_depara, conta_padrao, score_minimo=SCORE_MINIMO):
+    """Resolve cada nome normalizado distinto: DE-PARA, depois a base exata, depois o mais parecido da base.
+
+    Devolve um DataFrame indexado pelo nome com as colunas fornecedor_nome, conta e score.
+    """
+    df = pd.DataFrame({"nome": pd.unique(pd.Series(nomes, dtype=object))})
+    df["conta"] = df["nome"].map(mapa_depara).astype(object)
+    df["fornecedor_nome"] = ""
+    df["score"] = np.where(df["conta"].notna(), 100.0, 0.0)
+
+    posicao = df["nome"].map(indice.posicao)
+    exato = df["conta"].isna() & posicao.notna()
+    df.loc[exato, "conta"] = [indice.codigos[int(p)] for p in posicao[exato]]
+    df.loc[exato, "fornecedor_nome"] = [indice.nomes[int(p)] for p in posicao[exato]]
+    df.loc[exato, "score"] = 100.0
+
+    restantes = df["conta"].isna()
+    if restantes.any():
+        with etapa("fornecedores_semelhantes") as registro:
+            semelhantes = buscar_semelhantes(df.loc[restantes, "nome"].tolist(), indice, score_minimo)
+            registro["linhas"] = int(restantes.sum())
+        for i, nome in df.loc[restantes, "nome"].items():
+            chave, score = semelhantes[nome]
+            if chave is not None:
+                p = indice.posicao[chave]
+                df.at[i, "conta"] = indice.codigos[p]
+                df.at[i, "fornecedor_nome"] = indice.nomes[p]
+                df.at[i, "score"] = score
+
+    df["conta"] = df["conta"].fillna(conta_padrao)
+    return df.set_index("nome")
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+# Tipos do lançamento; em ordem alfabética para ordenar igual ao texto
+TIPOS = ["C", "D"]
+
+# Colunas de poucos valores distintos, guardadas como categoria (se forem só texto)
+COLUNAS_CATEGORIA = ["banco", "conta_debito", "conta_credito", "fornecedor_nome"]
+
+# Colunas em centavos: valor -> centavos, valor_debito -> centavos_debito etc.
+PREFIXO_CENTAVOS, PREFIXO_VALOR = "centavos", "valor"
+
+
+def padronizar(df):
+    """Lote com o esquema da tabela: data datetime64, valor em centavos (int64), tipo e contas como categoria.
+
+    As colunas mantêm a ordem; "valor" vira "centavos" na mesma posição (parsers que já entregam
+    "centavos" só têm a coluna convertida para int64). Linhas sem valor numérico não têm como ser
+    conciliadas e ficam de fora.
+    """
+    df = pd.DataFrame(df)
+    if df.empty:
+        return df
+    colunas = {}
+    validos = np.ones(len(df), dtype=bool)
+    for nome in df.columns:
+        serie = df[nome]
+        if nome == "data":
+            serie = pd.to_datetime(serie, errors="coerce", dayfirst=True)
+        elif nome == "valor":
+            valores = pd.to_numeric(serie, errors="coerce")
+            validos &= valores.notna().to_numpy()
+            nome, serie = PREFIXO_CENTAVOS, np.rint(valores.fillna(0).to_numpy(dtype=float) * 100).astype(np.int64)
+        elif nome == PREFIXO_CENTAVOS:
+            # Parsers que já entregam centavos (services.valores)
+            validos &= serie.notna().to_numpy()
+            serie = serie.fillna(0).to_numpy(dtype=np.int64)
+        elif nome == "tipo":
+            serie = pd.Categorical(serie, categories=TIPOS)
+        elif nome in COLUNAS_CATEGORIA and pd.api.types.infer_dtype(serie, skipna=True) == "string":
+            serie = serie.astype("category")
+        colunas[nome] = serie
+    lote = pd.DataFrame(colunas, index=df.index)
+    if not validos.all():
+        print(f"[LANCAMENTOS] {int((~validos).sum())} linha(s) sem valor numérico ignorada(s)")
+        lote = lote[validos]
+    return lote.reset_index(drop=True)
+
+
+def em_reais(df):
+    """Cópia rasa com as colunas em centavos de volta em reais (valor, valor_debito...), na mesma posição"""
+    colunas = [c for c in df.columns if isinstance(c, str) and c.startswith(PREFIXO_CENTAVOS)]
+    if not colunas:
+        return df
+    df = df.copy(deep=False)
+    for coluna in colunas:
+        df[coluna] = df[coluna] / 100
+    return df.rename(columns={c: PREFIXO_VALOR + c[len(PREFIXO_CENTAVOS):] for c in colunas})
+
+
+def _juntar(partes):
+    if not partes:
+        return pd.DataFrame()
+    if len(partes) == 1:
+        return partes[0]
+    df = pd.concat(partes, ignore_index=True)
+    # Categorias diferentes entre lotes viram object no concat; voltam a ser categoria
+    for coluna in COLUNAS_CATEGORIA:
+        if coluna in df.columns and df[coluna].dtype == object and all(
+            isinstance(p[coluna].dtype, pd.CategoricalDtype) for p in partes if coluna in p.columns
+        ):
+            df[coluna] = df[coluna].astype("category")
+    return df
+
+
+class TabelaLancamentos:
+    """Lançamentos de vários arquivos, acrescentados em lotes e guardados separados por tipo (D/C).
+
+    do_tipo() devolve os lançamentos de um tipo já no esquema de padronizar(), sem conversões:
+    a junção dos lotes é feita uma vez e reaproveitada até o próximo anexar/remover, e com um
+    lote só é o próprio lote (sem cópia). Quem recebe não deve alterar o DataFrame.
+    """
+
+    def __init__(self):
+        self._lotes = {}
+        self._juncoes = {}
+
+    def anexar(self, fonte, df):
+        """Acrescenta um lote ao arquivo fonte; devolve o lote padronizado"""
+        lote = padronizar(df)
+        if lote.empty:
+            return lote
+        partes = self._lotes.setdefault(fonte, {tipo: [] for tipo in TIPOS})
+        # Como nos relatórios: o que não é débito fica com os créditos
+        debitos = (lote["tipo"] == "D").to_numpy() if "tipo" in lote.columns else np.zeros(len(lote), dtype=bool)
+        for tipo, linhas in (("D", debitos), ("C", ~debitos)):
+            if linhas.all():
+                partes[tipo].append(lote)
+            elif linhas.any():
+                partes[tipo].append(lote[linhas].reset_index(drop=True))
+        self._juncoes.clear()
+        return lote
+
+    def remover(self, fonte):
+        if self._lotes.pop(fonte, None) is None:
+            return False
+        self._juncoes.clear()
+        return True
+
+    def fontes(self):
+        return list(self._lotes)
+
+    def __contains__(self, fonte):
+        return fonte in self._lotes
+
+    def __len__(self):
+        return sum(len(lote) for partes in self._lotes.values() for lotes in partes.values() for lote in lotes)
+
+    def do_tipo(self, tipo):
+        if tipo not in self._juncoes:
+            self._juncoes[tipo] = _juntar([lote for partes in self._lotes.values() for lote in partes[tipo]])
+        return self._juncoes[tipo]
+
+    def tabela(self):
+        """Todos os lançamentos: débitos e depois créditos"""
+        if "todos" not in self._juncoes:
+            self._juncoes["todos"] = _juntar([df for df in (self.do_tipo("D"), self.do_tipo("C")) if len(df)])
+        return self._juncoes["todos"]
@@ -0,0 +1,53 @@
+import unicodedata
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# Textos distintos lembrados por função (nomes de fornecedores, históricos, cabeçalhos)
+TAMANHO_CACHE = 100_000
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def _sem_acentos(texto):
+    return unicodedata.normalize("NFD", texto).encode("ascii", "ignore").decode("ascii")
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def _normalizar(texto):
+    return " ".join(_sem_acentos(texto).lower().split())
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def _compactar(texto):
+    return "".join(_sem_acentos(texto).lower().split())
+
+
+def normalizar_texto(texto):
+    """Chave de comparação: sem acentos, minúsculo, espaços repetidos reduzidos a um.
+
+    É a mesma chave usada no DE-PARA, na base de fornecedores e nos relatórios das empresas.
+    """
+    if not isinstance(texto, str):
+        texto = str(texto)
+    return _normalizar(texto)
+
+
+def normalizar_compacto(texto):
+    """Como normalizar_texto, mas sem nenhum espaço (ex: 'Saldo Anterior' -> 'saldoanterior')"""
+    if not isinstance(texto, str):
+        texto = str(texto)
+    return _compactar(texto)
+
+
+def remover_acentos(texto):
+    """Só tira acentos e espaços das pontas, mantendo maiúsculas; o que não é texto volta como veio"""
+    if not isinstance(texto, str):
+        return texto
+    return _sem_acentos(texto).strip()
+
+
+def normalizar_serie(serie, funcao=normalizar_texto):
+    """Aplica a normalização a uma Series inteira, calculando cada valor distinto uma única vez"""
+    codigos, distintos = pd.factorize(serie.astype(str), use_na_sentinel=False)
+    normalizados = np.array([funcao(valor) for valor in distintos], dtype=object)
+    return pd.Series(normalizados[codigos], index=serie.index, dtype=object)
@@ -0,0 +1,259 @@
+import time
+import numpy as np
+import pandas as pd
+
+from services.lancamentos import em_reais
+
+# Dias de diferença aceitos entre a data do relatório e a do extrato (compensação, agendamentos)
+TOLERANCIA_DIAS = 2
+
+# Limites da busca de lançamentos agrupados (borderô, lote de pagamentos, repasse de adquirente)
+MAX_ITENS_GRUPO = 8
+MAX_CANDIDATOS = 60
+ORCAMENTO_POR_DIA = 0.5
+
+COLUNAS_DETALHE = [
+    "situacao", "grupo", "tipo", "data_relatorio", "valor_relatorio", "data_extrato", "valor_extrato",
+    "banco", "historico", "dias"
+]
+
+
+class _TempoEsgotado(Exception):
+    pass
+
+
+def _chaves(df):
+    """Posição, tipo, valor absoluto em centavos e número do dia de cada linha pareável"""
+    datas = pd.to_datetime(df["data"], errors="coerce", dayfirst=True)
+    if "centavos" in df.columns:
+        # Já padronizado (services.lancamentos): valor em centavos, sem linhas vazias
+        centavos = np.abs(df["centavos"].to_numpy(dtype=np.int64))
+        validos = datas.notna().to_numpy()
+    else:
+        valores = pd.to_numeric(df["valor"], errors="coerce")
+        centavos = np.rint(valores.abs().to_numpy() * 100)
+        validos = (datas.notna() & valores.notna()).to_numpy()
+    return pd.DataFrame({
+        "posicao": np.arange(len(df))[validos],
+        "tipo": df["tipo"].astype(str).to_numpy()[validos],
+        "centavos": centavos[validos].astype(np.int64),
+        "dia": datas.to_numpy()[validos].astype("datetime64[D]").astype(np.int64),
+    })
+
+
+def _parear_mesmo_dia(rel, ext):
+    """Pareamento exato (tipo, valor, dia): a n-ésima ocorrência de um lado com a n-ésima do outro"""
+    chave = ["tipo", "centavos", "dia"]
+    rel = rel.assign(ocorrencia=rel.groupby(chave).cumcount())
+    ext = ext.assign(ocorrencia=ext.groupby(chave).cumcount())
+    pares = rel.merge(ext, on=chave + ["ocorrencia"], suffixes=("_rel", "_ext"))
+    return pares["posicao_rel"].to_numpy(), pares["posicao_ext"].to_numpy()
+
+
+def _parear_com_tolerancia(rel, ext, tolerancia_dias):
+    """Para cada valor presente dos dois lados, percorre as datas ordenadas com dois ponteiros"""
+    tipos = {tipo: i for i, tipo in enumerate(pd.unique(pd.concat([rel["tipo"], ext["tipo"]])))}
+    balde_rel = rel["centavos"].to_numpy() * len(tipos) + rel["tipo"].map(tipos).to_numpy()
+    balde_ext = ext["centavos"].to_numpy() * len(tipos) + ext["tipo"].map(tipos).to_numpy()
+
+    comuns = np.intersect1d(balde_rel, balde_ext)
+    if not len(comuns):
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    lados = []
+    for df, balde in ((rel, balde_rel), (ext, balde_ext)):
+        manter = np.isin(balde, comuns)
+        balde, dia, posicao = balde[manter], df["dia"].to_numpy()[manter], df["posicao"].to_numpy()[manter]
+        ordem = np.lexsort((posicao, dia, balde))
+        balde, dia, posicao = balde[ordem], dia[ordem], posicao[ordem]
+        inicios = np.searchsorted(balde, comuns, side="left")
+        fins = np.searchsorted(balde, comuns, side="right")
+        lados.append((dia.tolist(), posicao.tolist(), inicios.tolist(), fins.tolist()))
+
+    (dias_r, pos_r, ini_r, fim_r), (dias_e, pos_e, ini_e, fim_e) = lados
+    pares_rel, pares_ext = [], []
+    for i, fim_i, j, fim_j in zip(ini_r, fim_r, ini_e, fim_e):
+        while i < fim_i and j < fim_j:
+            diferenca = dias_e[j] - dias_r[i]
+            if abs(diferenca) <= tolerancia_dias:
+                pares_rel.append(pos_r[i])
+                pares_ext.append(pos_e[j])
+                i += 1
+                j += 1
+            elif diferenca < 0:
+                j += 1
+            else:
+                i += 1
+    return np.array(pares_rel, dtype=np.int64), np.array(pares_ext, dtype=np.int64)
+
+
+def _sem_posicoes(df, posicoes):
+    manter = np.ones(len(df), dtype=bool)
+    manter[posicoes] = False
+    return df[manter]
+
+
+def parear_lancamentos(relatorio, extrato, tolerancia_dias=TOLERANCIA_DIAS):
+    """Pareia 1 a 1 lançamentos do relatório com linhas do extrato de mesmo tipo e mesmo valor absoluto.
+
+    Primeiro casa as linhas do mesmo dia; as que sobram podem casar com até tolerancia_dias de diferença.
+    Devolve (pares, sobras_relatorio, sobras_extrato). Em pares as colunas de cada lado levam o sufixo
+    _relatorio/_extrato e "dias" é a data do extrato menos a do relatório; as sobras mantêm o índice original.
+    """
+    relatorio = pd.DataFrame(relatorio)
+    extrato = pd.DataFrame(extrato)
+    if relatorio.empty or extrato.empty:
+        return pd.DataFrame(), relatorio, extrato
+
+    rel, ext = _chaves(relatorio), _chaves(extrato)
+    pos_rel, pos_ext = _parear_mesmo_dia(rel, ext)
+
+    if tolerancia_dias > 0:
+        extra_rel, extra_ext = _parear_com_tolerancia(
+            rel[~rel["posicao"].isin(pos_rel)], ext[~ext["posicao"].isin(pos_ext)], tolerancia_dias
+        )
+        pos_rel, pos_ext = np.concatenate([pos_rel, extra_rel]), np.concatenate([pos_ext, extra_ext])
+
+    dias_rel = rel.set_index("posicao")["dia"]
+    dias_ext = ext.set_index("posicao")["dia"]
+    pares = _juntar_lados(
+        relatorio, pos_rel, extrato, pos_ext, dias_ext.loc[pos_ext].to_numpy() - dias_rel.loc[pos_rel].to_numpy()
+    )
+
+    return pares, _sem_posicoes(relatorio, pos_rel), _sem_posicoes(extrato, pos_ext)
+
+
+def _juntar_lados(relatorio, pos_rel, extrato, pos_ext, dias):
+    pares = pd.concat([
+        relatorio.iloc[pos_rel].reset_index(drop=True).add_suffix("_relatorio"),
+        extrato.iloc[pos_ext].reset_index(drop=True).add_suffix("_extrato"),
+    ], axis=1)
+    pares["dias"] = dias
+    return pares
+
+
+def _subconjunto(valores, alvo, max_itens, prazo):
+    """Posições de valores (em ordem decrescente) com pelo menos dois itens somando exatamente alvo, ou None"""
+    sufixo = np.cumsum(valores[::-1])[::-1].tolist() + [0]
+    escolhidos = []
+    visitados = 0
+
+    def buscar(inicio, restante):
+        nonlocal visitados
+        visitados += 1
+        if visitados % 2000 == 0 and time.perf_counter() > prazo:
+            raise _TempoEsgotado()
+        for i in range(inicio, len(valores)):
+            if sufixo[i] < restante:
+                return False
+            valor = valores[i]
+            # Valor igual ao anterior no mesmo nível daria a mesma busca
+            if valor > restante or (i > inicio and valor == valores[i - 1]):
+                continue
+            escolhidos.append(i)
+            if valor == restante:
+                if len(escolhidos) >= 2:
+                    return True
+            elif len(escolhidos) < max_itens and buscar(i + 1, restante - valor):
+                return True
+            escolhidos.pop()
+        return False
+
+    return list(escolhidos) if buscar(0, alvo) else None
+
+
+def parear_agrupados(relatorio, extrato, tolerancia_dias=TOLERANCIA_DIAS, max_itens=MAX_ITENS_GRUPO,
+                     max_candidatos=MAX_CANDIDATOS, orcamento_por_dia=ORCAMENTO_POR_DIA):
+    """Explica linhas do extrato pela soma exata de vários lançamentos do relatório (muitos para um).
+
+    Pensado para as sobras de parear_lancamentos: cada linha do extrato procura, entre os lançamentos
+    do mesmo tipo dentro da tolerância de datas e de valor menor que o dela, até max_itens que somem
+    o mesmo valor. Cada dia do extrato tem orcamento_por_dia segundos de busca.
+    Devolve (grupos, sobras_relatorio, sobras_extrato); grupos tem uma linha por lançamento do
+    relatório, com as colunas de pares e o número do grupo.
+    """
+    relatorio = pd.DataFrame(relatorio)
+    extrato = pd.DataFrame(extrato)
+    if relatorio.empty or extrato.empty:
+        return pd.DataFrame(), relatorio, extrato
+
+    rel, ext = _chaves(relatorio), _chaves(extrato)
+    rel = rel[rel["centavos"] > 0].sort_values(["tipo", "dia", "posicao"])
+    candidatos_por_tipo = {
+        tipo: (g["dia"].to_numpy(), g["centavos"].to_numpy(), g["posicao"].to_numpy())
+        for tipo, g in rel.groupby("tipo", sort=False)
+    }
+    usados = set()
+    pos_rel, pos_ext, dias, grupos = [], [], [], []
+    total_grupos = dias_esgotados = 0
+
+    ext = ext.sort_values(["dia", "centavos", "posicao"], ascending=[True, False, True])
+    for dia, alvos in ext.groupby("dia", sort=False):
+        dia = int(dia)
+        prazo = time.perf_counter() + orcamento_por_dia
+        try:
+            for tipo, alvo, posicao_ext in zip(alvos["tipo"], alvos["centavos"], alvos["posicao"]):
+                if tipo not in candidatos_por_tipo:
+                    continue
+                dias_c, centavos_c, posicoes_c = candidatos_por_tipo[tipo]
+                inicio = np.searchsorted(dias_c, dia - tolerancia_dias, side="left")
+                fim = np.searchsorted(dias_c, dia + tolerancia_dias, side="right")
+                janela = [
+                    (abs(dia - int(dias_c[k])), -int(centavos_c[k]), int(posicoes_c[k]), dia - int(dias_c[k]))
+                    for k in range(inicio, fim)
+                    if centavos_c[k] < alvo and posicoes_c[k] not in usados
+                ]
+                # Os mais próximos da data primeiro; a busca percorre do maior valor para o menor
+                janela = sorted(sorted(janela)[:max_candidatos], key=lambda c: (c[1], c[2]))
+                valores = [-c[1] for c in janela]
+                if len(valores) < 2 or sum(valores) < alvo:
+                    continue
+                escolhidos = _subconjunto(valores, int(alvo), max_itens, prazo)
+                if escolhidos is None:
+                    continue
+                total_grupos += 1
+                for k in escolhidos:
+                    usados.add(janela[k][2])
+                    pos_rel.append(janela[k][2])
+                    pos_ext.append(posicao_ext)
+                    dias.append(janela[k][3])
+                    grupos.append(total_grupos)
+        except _TempoEsgotado:
+            dias_esgotados += 1
+
+    if dias_esgotados:
+        print(f"[PAREAMENTO] Busca de agrupados interrompida por tempo em {dias_esgotados} dia(s)")
+    if not grupos:
+        return pd.DataFrame(), relatorio, extrato
+
+    grupos_df = _juntar_lados(relatorio, pos_rel, extrato, pos_ext, dias)
+    grupos_df.insert(0, "grupo", grupos)
+    return grupos_df, _sem_posicoes(relatorio, pos_rel), _sem_posicoes(extrato, sorted(set(pos_ext)))
+
+
+def montar_detalhe(pares, sobras_relatorio, sobras_extrato, grupos=None):
+    """Tabela única para conferência: pares, grupos e sobras de cada lado, ordenados por tipo e data"""
+    renomear = {"tipo_relatorio": "tipo", "banco_extrato": "banco", "historico_extrato": "historico"}
+    partes = []
+    if not pares.empty:
+        partes.append(pares.rename(columns=renomear).assign(situacao="Pareado"))
+    if grupos is not None and not grupos.empty:
+        partes.append(grupos.rename(columns=renomear).assign(situacao="Agrupado"))
+    if not sobras_relatorio.empty:
+        partes.append(sobras_relatorio.add_suffix("_relatorio").rename(columns={"tipo_relatorio": "tipo"})
+                      .assign(situacao="Só no relatório"))
+    if not sobras_extrato.empty:
+        partes.append(sobras_extrato.add_suffix("_extrato").rename(columns={
+            "tipo_extrato": "tipo", "banco_extrato": "banco", "historico_extrato": "historico"
+        }).assign(situacao="Só no extrato"))
+    if not partes:
+        return pd.DataFrame(columns=COLUNAS_DETALHE)
+
+    detalhe = em_reais(pd.concat(partes, ignore_index=True)).reindex(columns=COLUNAS_DETALHE)
+    detalhe["historico"] = detalhe["historico"].fillna("")
+    detalhe["grupo"] = detalhe["grupo"].astype("Int64")
+    for coluna in ("data_relatorio", "data_extrato"):
+        detalhe[coluna] = pd.to_datetime(detalhe[coluna], errors="coerce", dayfirst=True)
+    # Grupos ficam juntos, na data do extrato
+    detalhe["_ordem"] = detalhe["data_relatorio"].where(detalhe["situacao"] != "Agrupado").fillna(detalhe["data_extrato"])
+    return detalhe.sort_values(["tipo", "_ordem", "grupo"], kind="stable").drop(columns="_ordem").reset_index(drop=True)
@@ -0,0 +1,405 @@
+import os
+import json
+import time
+import queue
+import importlib
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from parsers.bancos.registro import AUTOMATICO, BANCOS, banco_pelo_conteudo, carregar_parser, identificar_banco
+
+from services.config import recurso_path, workers_importacao
+from services.depara import carregar_depara
+from services.conciliacao import EXTRATO, RELATORIO, AgregadosConciliacao
+from services.lancamentos import TabelaLancamentos, em_reais
+from services.cache_extratos import carregar_extrato_cacheado
+from services.categorias import Categorizador
+from services.processamento import (
+    preparar_resultado,
+    caminho_resultado,
+    gravar_txt_contabil,
+    remover_transferencias_entre_bancos
+)
+from services.normalizacao import normalizar_texto
+from services.pareamento import TOLERANCIA_DIAS, parear_lancamentos, parear_agrupados, montar_detalhe
+from services.saida import FORMATO_PADRAO, arquivos_em_conjunto, gravar_resultados
+from services.rastreamento import etapa, rastreamento_atual, vincular
+from services.tarefas import tarefa_atual, verificar_cancelamento, vincular_tarefa
+
+# Abas da pasta de trabalho gerada por SessaoConciliacao.processar, nesta ordem
+RESULTADOS = ["Empresa", "Saida", "Entrada", "Pareamento", "Transferencias"]
+
+
+def carregar_config_empresa(id_empresa, caminho_config=None):
+    with open(caminho_config or recurso_path("config/empresas.json"), "r", encoding="utf-8") as f:
+        return json.load(f)[id_empresa]
+
+
+def inferir_tipo_relatorio(caminho):
+    nome = normalizar_texto(os.path.basename(caminho))
+    if "receb" in nome or "entrada" in nome:
+        return "ENTRADA"
+    if "pag" in nome or "saida" in nome:
+        return "SAIDA"
+    return None
+
+
+def listar_arquivos_empresa(pasta):
+    """Separa os arquivos da pasta_extratos em extratos (banco, caminho) e relatórios (tipo, caminho)"""
+    extratos, relatorios = [], []
+    for nome in sorted(os.listdir(pasta)):
+        caminho = os.path.join(pasta, nome)
+        extensao = os.path.splitext(nome)[1].lower()
+        if not os.path.isfile(caminho):
+            continue
+        if extensao == ".pdf":
+            banco = identificar_banco(caminho)
+            if banco:
+                extratos.append((banco, caminho))
+            else:
+                print(f"[PIPELINE] Banco não reconhecido pelo conteúdo nem pelo nome do arquivo, ignorado: {nome}")
+        elif extensao in (".csv", ".xlsx"):
+            relatorios.append((inferir_tipo_relatorio(caminho), caminho))
+    return extratos, relatorios
+
+
+def filtrar_periodo(dados, periodo):
+    """Mantém apenas os registros do mês 'AAAA-MM' informado"""
+    if not periodo or dados is None or len(dados) == 0:
+        return dados
+    datas = dados["data"]
+    if not pd.api.types.is_datetime64_any_dtype(datas):
+        datas = pd.to_datetime(datas, errors="coerce", dayfirst=True)
+    return dados[datas.dt.strftime("%Y-%m") == periodo]
+
+
+def _chave_arquivo(caminho):
+    return os.path.normcase(os.path.abspath(caminho))
+
+
+def resumo_importacao(situacoes):
+    """Texto com uma linha por arquivo importado (banco/tipo e linhas) e os erros ao final"""
+    linhas, erros = [], []
+    for s in situacoes:
+        if s["erro"]:
+            erros.append(f"{s['arquivo']}: {s['erro']}")
+        else:
+            rotulo = s["chave"] or ("automático" if s["origem"] == "relatorio" else "")
+            linhas.append(f"{s['arquivo']} ({rotulo}): {s['linhas']} linhas")
+    if erros:
+        linhas += ["", f"{len(erros)} arquivo(s) com erro:"] + erros
+    return "\n".join(linhas)
+
+
+class SessaoConciliacao:
+    """Estado de uma conciliação (relatórios da empresa + extratos) e as etapas do processo, sem tela.
+
+    Os dados ficam em tabelas de tipo fixo (services.lancamentos), por arquivo: importar de novo
+    um arquivo substitui o anterior e remover_arquivo tira só ele. Os totais por dia, banco e tipo
+    (agregados) são atualizados a cada arquivo, então o resumo diário sai logo após cada importação.
+    """
+
+    def __init__(self, id_empresa, config=None, caminho_base_fornecedores=None, caminho_depara=None):
+        self.id_empresa = id_empresa
+        self.config = config or carregar_config_empresa(id_empresa)
+        self.nome_parser_empresa = self.config["parser"]
+        self.caminho_base_fornecedores = caminho_base_fornecedores or recurso_path("config/Base_Fornecedores.xlsx")
+        self.caminho_depara = caminho_depara or recurso_path("config/DE-PARA.xlsx")
+        self.parser_empresa = None
+        self.resetar()
+
+    def _preparar_relatorios(self):
+        """Parser da empresa, DE-PARA e base de fornecedores usados na leitura dos relatórios"""
+        self.parser_empresa = importlib.import_module(f"parsers.{self.nome_parser_empresa}")
+        with etapa("carregar_depara") as registro:
+            mapa = carregar_depara(self.caminho_depara)
+            registro["linhas"] = len(mapa)
+        base_path = self.caminho_base_fornecedores if os.path.exists(self.caminho_base_fornecedores) else None
+        return mapa, base_path
+
+    def importar_relatorios(self, caminhos, tipo=None, conta_corrente=""):
+        mapa, base_path = self._preparar_relatorios()
+        for caminho in caminhos:
+            self.remover_arquivo(caminho)
+            with etapa("relatorio", arquivo=os.path.basename(caminho), tipo=tipo) as registro:
+                registro["linhas"] = 0
+                for transacoes, conciliacao in self._blocos_relatorio(caminho, tipo, conta_corrente, base_path, mapa):
+                    registro["linhas"] += len(transacoes)
+                    self._acumular(caminho, transacoes, conciliacao)
+
+    def _blocos_relatorio(self, caminho, tipo, conta_corrente, base_path, mapa):
+        """Usa a leitura em blocos quando o parser da empresa oferece, para não carregar o arquivo inteiro"""
+        parametros = dict(conta_corrente=conta_corrente, base_path=base_path, mapa_depara=mapa, tipo=tipo)
+        if hasattr(self.parser_empresa, "importar_arquivo_em_blocos"):
+            for bloco in self.parser_empresa.importar_arquivo_em_blocos(caminho, **parametros):
+                verificar_cancelamento()
+                yield bloco
+        else:
+            yield self.parser_empresa.importar_arquivo(path_arquivo=caminho, **parametros)
+
+    def _acumular(self, caminho, transacoes, conciliacao):
+        # Os parsers podem devolver DataFrames ou listas de dicts; as tabelas separam débitos e créditos
+        chave = _chave_arquivo(caminho)
+        self.lancamentos.anexar(chave, transacoes)
+        self.agregados.adicionar(chave, RELATORIO, self.conciliacoes.anexar(chave, conciliacao))
+
+    def _guardar_extrato(self, caminho, extrato):
+        chave = _chave_arquivo(caminho)
+        self.remover_arquivo(caminho)
+        self.agregados.adicionar(chave, EXTRATO, self.extratos.anexar(chave, extrato))
+
+    def remover_arquivo(self, caminho):
+        """Tira da sessão um relatório ou extrato importado; só os totais dos dias dele mudam"""
+        chave = _chave_arquivo(caminho)
+        removido = [tabela.remover(chave) for tabela in (self.lancamentos, self.conciliacoes, self.extratos)]
+        self.agregados.remover(chave)
+        return any(removido)
+
+    @property
+    def transacoes_saida(self):
+        return self.lancamentos.do_tipo("D")
+
+    @property
+    def transacoes_entrada(self):
+        return self.lancamentos.do_tipo("C")
+
+    @property
+    def conciliacoes_saida(self):
+        return self.conciliacoes.do_tipo("D")
+
+    @property
+    def conciliacoes_entrada(self):
+        return self.conciliacoes.do_tipo("C")
+
+    def resumo_diario(self, periodo=None):
+        """Débitos e créditos por dia do relatório e de cada banco, com o que já foi importado"""
+        return self.agregados.resumo_diario(periodo)
+
+    def banco_do_extrato(self, caminho, banco=None):
+        """Banco escolhido ou, sem escolha (None/AUTOMATICO), o reconhecido pela primeira página do PDF.
+
+        Escolha que contradiz a primeira página levanta ValueError (aparece no resumo da importação).
+        """
+        nome = os.path.basename(caminho)
+        automatico = banco in (None, "", AUTOMATICO)
+        with etapa("identificar_banco", arquivo=nome) as registro:
+            reconhecido = identificar_banco(caminho) if automatico else banco_pelo_conteudo(caminho)
+            registro["banco"] = reconhecido
+        if automatico:
+            if reconhecido is None:
+                raise ValueError(f"Não foi possível reconhecer o banco do extrato {nome}. Escolha o banco manualmente.")
+            print(f"[PIPELINE] {nome}: banco reconhecido como {reconhecido}")
+            return reconhecido
+        if reconhecido and reconhecido != banco:
+            # Antes de ler o PDF inteiro: o parser errado só devolveria um extrato vazio
+            raise ValueError(
+                f"O extrato {nome} é do banco {reconhecido}, não do banco escolhido ({banco}). "
+                f"Escolha {reconhecido} ou a opção automática."
+            )
+        return banco
+
+    def _ler_extrato(self, caminho, banco):
+        parser_banco = carregar_parser(banco)
+        with etapa("extrato", banco=banco, arquivo=os.path.basename(caminho)) as registro:
+            extrato = carregar_extrato_cacheado(parser_banco, banco, caminho)
+            registro["linhas"] = len(extrato)
+        extrato["banco"] = banco
+        return extrato
+
+    def adicionar_extrato(self, caminho, banco=None):
+        banco = self.banco_do_extrato(caminho, banco)
+        extrato = self._ler_extrato(caminho, banco)
+        self._guardar_extrato(caminho, extrato)
+        return extrato
+
+    def importar_arquivos(self, relatorios=(), extratos=(), conta_corrente="", workers=None, ao_progredir=None):
+        """Lê vários relatórios [(tipo, caminho)] e extratos [(banco ou None, caminho)] ao mesmo tempo.
+
+        Os dados entram na sessão na ordem em que os arquivos foram passados (relatórios e depois
+        extratos), e não na ordem em que terminam: os blocos do arquivo da vez entram assim que são
+        lidos, e só os arquivos que andam na frente dele ficam guardados até chegar a sua vez.
+        Um arquivo com erro (ou cancelado no meio) sai da sessão inteiro e não impede os demais;
+        os que já tinham terminado ficam. ao_progredir(concluidos, total, situacao) é chamado a cada
+        arquivo terminado. Devolve a situação de cada arquivo, na ordem de entrada (ver resumo_importacao).
+        """
+        tarefas = [("relatorio", tipo, caminho) for tipo, caminho in relatorios]
+        tarefas += [("extrato", banco, caminho) for banco, caminho in extratos]
+        if not tarefas:
+            return []
+        mapa, base_path = self._preparar_relatorios() if relatorios else (None, None)
+        rastro = rastreamento_atual()
+        etapa_pai = rastro.etapa_atual() if rastro else None
+        tarefa = tarefa_atual()
+        # Avisos das threads de leitura: (índice, "bloco", dados), (índice, "fim", ...) ou (índice, "erro", exceção)
+        avisos = queue.Queue()
+
+        def ler(i, origem, chave, caminho):
+            inicio = time.perf_counter()
+            try:
+                with vincular(rastro, etapa_pai), vincular_tarefa(tarefa):
+                    verificar_cancelamento()
+                    if origem == "relatorio":
+                        with etapa("relatorio", arquivo=os.path.basename(caminho), tipo=chave) as registro:
+                            registro["linhas"] = 0
+                            for bloco in self._blocos_relatorio(caminho, chave, conta_corrente, base_path, mapa):
+                                registro["linhas"] += len(bloco[0])
+                                avisos.put((i, "bloco", bloco))
+                            linhas = registro["linhas"]
+                    else:
+                        chave = self.banco_do_extrato(caminho, chave)
+                        extrato = self._ler_extrato(caminho, chave)
+                        linhas = len(extrato)
+                        avisos.put((i, "bloco", extrato))
+            except Exception as e:
+                avisos.put((i, "erro", e))
+            else:
+                avisos.put((i, "fim", (chave, linhas, time.perf_counter() - inicio)))
+
+        pendentes = [[] for _ in tarefas]
+        situacoes = [None] * len(tarefas)
+        vez = 0
+        iniciado = False
+
+        def entrar(i, tipo, dados):
+            # Só o arquivo da vez entra na sessão; a troca da versão anterior é feita no primeiro bloco
+            nonlocal iniciado
+            origem, _, caminho = tarefas[i]
+            if tipo == "erro":
+                if iniciado:
+                    self.remover_arquivo(caminho)
+                return
+            if not iniciado:
+                self.remover_arquivo(caminho)
+                iniciado = True
+            if tipo != "bloco":
+                return
+            if origem == "relatorio":
+                self._acumular(caminho, *dados)
+            else:
+                self._guardar_extrato(caminho, dados)
+
+        workers = max(1, min(workers or workers_importacao(), len(tarefas)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for i, (origem, chave, caminho) in enumerate(tarefas):
+                executor.submit(ler, i, origem, chave, caminho)
+            concluidos = 0
+            while concluidos < len(tarefas):
+                i, tipo, dados = avisos.get()
+                if tipo != "bloco":
+                    concluidos += 1
+                    origem, chave, caminho = tarefas[i]
+                    situacao = {"arquivo": os.path.basename(caminho), "caminho": caminho, "origem": origem,
+                                "chave": chave, "linhas": 0, "duracao_s": None, "erro": None}
+                    if tipo == "fim":
+                        chave, linhas, duracao = dados
+                        situacao.update(chave=chave, linhas=linhas, duracao_s=round(duracao, 3))
+                    else:
+                        situacao["erro"] = str(dados) or type(dados).__name__
+                        print(f"[PIPELINE] Erro ao importar {situacao['arquivo']}: {situacao['erro']}")
+                    situacoes[i] = situacao
+                    if ao_progredir:
+                        ao_progredir(concluidos, len(tarefas), situacao)
+                if i != vez:
+                    pendentes[i].append((tipo, dados))
+                    continue
+                entrar(i, tipo, dados)
+                # Terminado o arquivo da vez, entram os seguintes que já estavam esperando
+                while vez < len(tarefas) and situacoes[vez] is not None:
+                    vez += 1
+                    iniciado = False
+                    if vez < len(tarefas):
+                        # Um arquivo que já terminou com erro nem chega a entrar
+                        if situacoes[vez] is None or not situacoes[vez]["erro"]:
+                            for tipo, dados in pendentes[vez]:
+                                entrar(vez, tipo, dados)
+                        pendentes[vez] = []
+
+        # Cancelada no meio: o arquivo que estava entrando já saiu; os terminados ficam
+        verificar_cancelamento()
+        return situacoes
+
+    def contagem_categorias(self):
+        """Linhas de cada categoria (da mais frequente para a menos) nos resultados do último processar"""
+        return dict(self.categorizador.contagem.most_common())
+
+    def tem_relatorios(self):
+        return len(self.lancamentos) > 0
+
+    def processar(self, nome_empresa, conta_corrente="", periodo=None, pasta_destino=None, incluir_data=True,
+                  tolerancia_dias=TOLERANCIA_DIAS, defasagem_transferencias=0, formato=FORMATO_PADRAO, formatos=None):
+        """Concilia tudo o que foi importado e grava os arquivos; devolve {nome: caminhos gerados}.
+
+        Os resultados (RESULTADOS) vão numa só pasta de trabalho, uma aba cada, salvo os que
+        formatos ({resultado: "parquet"/"csv"}) ou formato mandarem para outro formato.
+        """
+        nome_limpo = normalizar_texto(nome_empresa).replace(" ", "_")
+        self.categorizador.contagem.clear()
+        nome_base = f"{nome_limpo}_{conta_corrente}" + (f"_{periodo}" if periodo else "")
+        resultados = {}
+
+        extrato_banco = filtrar_periodo(self.extratos.tabela(), periodo)
+        fora_da_conciliacao = None
+        if self.nome_parser_empresa == "mecflu":
+            with etapa("transferencias") as registro:
+                filtrado, resultados["Transferencias"] = remover_transferencias_entre_bancos(
+                    extrato_banco, defasagem_dias_uteis=defasagem_transferencias, retornar_pares=True
+                )
+                fora_da_conciliacao = extrato_banco.drop(index=filtrado.index)
+                extrato_banco = filtrado
+                registro["linhas"] = len(resultados["Transferencias"])
+
+        resultados["Empresa"] = filtrar_periodo(self.lancamentos.tabela(), periodo)
+
+        for tipo, nome, funcao in (
+            ("D", "Saida", self.parser_empresa.conciliar_saidas),
+            ("C", "Entrada", self.parser_empresa.conciliar_entradas),
+        ):
+            with etapa(f"conciliar_{nome.lower()}s") as registro:
+                somar_bancos = getattr(self.parser_empresa, "SOMAR_BANCOS", None)
+                if somar_bancos is None:
+                    conciliacao = filtrar_periodo(self.conciliacoes.do_tipo(tipo), periodo)
+                    resultados[nome] = funcao(em_reais(conciliacao), em_reais(extrato_banco))
+                else:
+                    # Direto dos totais por dia já acumulados, sem reagrupar os lançamentos
+                    resultados[nome] = self.agregados.resumo_conciliacao(
+                        tipo, periodo, somar_bancos[tipo], descontar=fora_da_conciliacao
+                    )
+                registro["linhas"] = len(resultados[nome])
+
+        # Lançamento a lançamento: o que casou com o extrato (um a um ou em grupo) e o que sobrou de cada lado
+        with etapa("pareamento") as registro:
+            pares, sobras_relatorio, sobras_extrato = parear_lancamentos(
+                filtrar_periodo(self.conciliacoes.tabela(), periodo), extrato_banco, tolerancia_dias
+            )
+            grupos, sobras_relatorio, sobras_extrato = parear_agrupados(sobras_relatorio, sobras_extrato, tolerancia_dias)
+            resultados["Pareamento"] = montar_detalhe(pares, sobras_relatorio, sobras_extrato, grupos)
+            registro["linhas"] = len(resultados["Pareamento"])
+
+        preparados = {}
+        for nome in RESULTADOS:
+            # Valores saem em reais, como os parsers entregaram
+            df = preparar_resultado(em_reais(resultados[nome]) if nome in resultados else None, self.categorizador)
+            if df is not None:
+                preparados[nome] = df
+
+        # Cancelada no meio, nenhum dos arquivos desta execução fica no destino
+        with arquivos_em_conjunto() as gravados:
+            with etapa("gravar_resultados", formato=formato) as registro:
+                gerados = {"resultados": gravar_resultados(
+                    caminho_resultado(f"Conciliacao_{nome_base}", incluir_data, pasta_destino),
+                    preparados, formatos=formatos, formato_padrao=formato
+                )}
+                gravados += gerados["resultados"]
+                registro["linhas"] = sum(len(df) for df in preparados.values())
+            empresa = preparados.get("Empresa")
+            if empresa is not None and "valor" in empresa.columns:
+                with etapa("gravar_txt") as registro:
+                    caminho_txt = caminho_resultado(f"Empresa_{nome_base}", incluir_data, pasta_destino) + ".txt"
+                    gerados["txt"] = [gravar_txt_contabil(caminho_txt, empresa)]
+                    registro["linhas"] = len(empresa)
+        return gerados
+
+    def resetar(self):
+        self.lancamentos, self.conciliacoes, self.extratos = TabelaLancamentos(), TabelaLancamentos(), TabelaLancamentos()
+        self.agregados = AgregadosConciliacao()
+        self.categorizador = Categorizador()
@@ -1,73 +1,143 @@
 import os
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from tkinter import filedialog, messagebox
 from PIL import Image
+from services.categorias import categorizador_padrao
 from services.config import caminho_area_de_trabalho
-from services.depara import carregar_depara, normalize_text
+from services.depara import carregar_depara
+from services.normalizacao import normalizar_texto
+from services.rastreamento import etapa
+from services.saida import FORMATO_PADRAO, arquivos_em_conjunto, em_lotes, gravacao_atomica, gravar_resultados
 
 
 def identificar_categoria(historico: str) -> str:
-    texto = historico.lower()
-
-    if "entre contas" in texto or "transferência entre contas" in texto or "movimentação entre contas" in texto:
-        return "Transferência Interna"
-    elif "Pix" in texto:
-        return "Pix"
-    elif "Ted" in texto or "crédito em conta" in texto:
-        return "TED"
-    elif "cartão" in texto or "compra" in texto:
-        return "Cartão"
-    elif "boleto" in texto:
-        return "Boleto"
-    elif "tarifa" in texto or "mensal" in texto or "relac" in texto or "cobrança" in texto:
-        return "Tarifa"
-    elif "transferência" in texto:
-        return "Transferência"
-    elif "recebimento" in texto or "fornecedor" in texto or "receita" in texto:
-        return "Recebimento"
-    elif "pagto" in texto or "débito" in texto or "doc" in texto:
-        return "Pagamento"
-    else:
-        return "Outros"
+    """Categoria de um histórico só; para uma coluna inteira use categorizador_padrao().categorizar()"""
+    return categorizador_padrao().categorizar([historico]).iloc[0]
 
 
-def salvar_resultados(transacoes, nome_base="extrato", incluir_data=True, salvar_txt=False):
+# Lançamentos formatados e gravados por vez no TXT contábil
+TAMANHO_LOTE_TXT = 50_000
+# Acima disso o valor em centavos pode não bater com o "%f" do float; esses vão pelo format normal
+LIMITE_VALOR_CENTAVOS = 1e9
+
+
+def _formatar_data_txt(valor):
+    try:
+        return pd.to_datetime(valor, dayfirst=True).strftime("%d%m%Y")
+    except Exception:
+        return str(valor)
+
+
+def _datas_txt(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.dt.strftime("%d%m%Y").fillna("NaT")
+    # Poucas datas distintas por arquivo: cada uma é convertida uma vez
+    vazias = serie.isna().to_numpy()
+    datas = serie.astype(object).map(str)
+    if (~vazias).any():
+        preenchidas = serie[~vazias]
+        mapa = {valor: _formatar_data_txt(valor) for valor in pd.unique(preenchidas)}
+        datas[~vazias] = preenchidas.map(mapa).to_numpy()
+    return datas
+
+
+def _valores_txt(serie):
+    """Mesmo texto de f"{abs(valor):2f}", montado a partir dos centavos quando o valor é exato"""
+    valores = np.abs(pd.to_numeric(serie).to_numpy(dtype=float))
+    centavos = np.rint(valores * 100)
+    exatos = np.isfinite(valores) & (valores < LIMITE_VALOR_CENTAVOS) & (np.abs(valores * 100 - centavos) < 1e-6)
+
+    centavos = np.where(exatos, centavos, 0).astype(np.int64)
+    texto = (
+        pd.Series(centavos // 100, index=serie.index).astype(str) + "."
+        + pd.Series(centavos % 100, index=serie.index).astype(str).str.zfill(2) + "0000"
+    )
+    if not exatos.all():
+        texto[~exatos] = [f"{v:2f}" for v in valores[~exatos]]
+    return texto
+
+
+def _coluna_txt(df, nome, padrao):
+    if nome in df.columns:
+        return df[nome].astype(str)
+    return pd.Series(padrao, index=df.index, dtype=object)
+
+
+def formatar_linhas_txt(df):
+    """Linhas do TXT contábil (data,debito,credito,valor,350,"descricao") de um lote, como uma só string"""
+    if df.empty:
+        return ""
+    linhas = (
+        _datas_txt(df["data"]) + ","
+        + _coluna_txt(df, "conta_debito", "99999") + ","
+        + _coluna_txt(df, "conta_credito", "99999") + ","
+        + _valores_txt(df["valor"]) + ',350,"'
+        + _coluna_txt(df, "descricao", "Extrato bancário").str.replace('"', "'", regex=False) + '"\n'
+    )
+    return "".join(linhas.tolist())
+
+
+def gravar_txt_contabil(caminho_txt, dados):
+    """Grava o TXT a partir de um DataFrame ou de um iterável de lotes (DataFrames ou listas de dicts)"""
+    with gravacao_atomica(caminho_txt) as temporario, open(temporario, "w", encoding="utf-8", buffering=1024 * 1024) as f:
+        for lote in em_lotes(dados, TAMANHO_LOTE_TXT):
+            f.write(formatar_linhas_txt(lote))
+    return caminho_txt
+
+
+def preparar_resultado(transacoes, categorizador=None):
+    """DataFrame do resultado, com a categoria de cada histórico; None se não houver o que gravar.
+
+    categorizador (padrão: categorizador_padrao()) acumula as linhas de cada categoria.
+    """
     if transacoes is None or (isinstance(transacoes, pd.DataFrame) and transacoes.empty):
-        return
-    
+        return None
+
     df = pd.DataFrame(transacoes)
 
     if "categoria" not in df.columns and "historico" in df.columns:
-        df["categoria"] = df["historico"].apply(identificar_categoria)
-    
+        with etapa("categorizar") as registro:
+            df["categoria"] = (categorizador or categorizador_padrao()).categorizar(df["historico"])
+            registro["linhas"] = len(df)
+            registro["categorias"] = df["categoria"].value_counts().to_dict()
+    return df
+
+
+def caminho_resultado(nome_base, incluir_data=True, pasta_destino=None):
+    """Caminho sem extensão: <pasta ou área de trabalho>/<nome_base>[_AAAA-MM-DD]"""
     data_hoje = datetime.today().strftime("%Y-%m-%d")
     sufixo = f"_{data_hoje}" if incluir_data else ""
-    caminho_base = os.path.join(caminho_area_de_trabalho(), f"{nome_base}{sufixo}")
+    return os.path.join(pasta_destino or caminho_area_de_trabalho(), f"{nome_base}{sufixo}")
 
-    try:
-        caminho_excel = caminho_base + ".xlsx"
-        df.to_excel(caminho_excel, index=False)
 
+def exportar_resultados(transacoes, nome_base="extrato", incluir_data=True, salvar_txt=False, pasta_destino=None,
+                        formato=FORMATO_PADRAO):
+    """Grava o resultado (xlsx, parquet ou csv) e opcionalmente o TXT contábil; devolve os caminhos, sem interação com a tela"""
+    df = preparar_resultado(transacoes)
+    if df is None:
+        return []
+
+    caminho_base = caminho_resultado(nome_base, incluir_data, pasta_destino)
+    with arquivos_em_conjunto() as caminhos:
+        caminhos += gravar_resultados(caminho_base, {"Sheet1": df}, formato_padrao=formato)
         if salvar_txt and "valor" in df.columns:
-            caminho_txt = caminho_base + ".txt"
-            with open(caminho_txt, "w", encoding="utf-8") as f:
-                for _, row in df.iterrows():
-                    try:
-                        data_fmt = datetime.strptime(str(row["data"]), "%Y-%m-%d").strftime("%d%m%Y")
-                    except:
-                        data_fmt = row["data"]
-
-                    descricao_formatada = str(row.get("descricao", "Extrato bancário")).replace('"', "'")
-                    conta_debito = row.get("conta_debito", "99999")
-                    conta_credito = row.get("conta_credito", "99999")
-                    linha = f'{data_fmt},{conta_debito},{conta_credito},{abs(row["valor"]):2f},350,"{descricao_formatada}"\n'
-                    f.write(linha)
-        
+            caminhos.append(gravar_txt_contabil(caminho_base + ".txt", df))
+
+    return caminhos
+
+
+def salvar_resultados(transacoes, nome_base="extrato", incluir_data=True, salvar_txt=False):
+    if transacoes is None or (isinstance(transacoes, pd.DataFrame) and transacoes.empty):
+        return
+
+    try:
+        caminhos = exportar_resultados(transacoes, nome_base=nome_base, incluir_data=incluir_data, salvar_txt=salvar_txt)
+
         messagebox.showinfo(
             "Arquivos salvos com sucesso!",
-            f"Foram gerados:\n\n{os.path.basename(caminho_excel)}"
-            + (f"\n{os.path.basename(caminho_txt)}" if salvar_txt else "") +
+            f"Foram gerados:\n\n" + "\n".join(os.path.basename(c) for c in caminhos) +
             f"\n\nNa sua área de trabalho."
         )
 
@@ -89,22 +159,123 @@ def gerar_resumo_diario(df: pd.DataFrame) -> pd.DataFrame:
     resultado = resumo.pivot_table(index="data", columns="coluna", values="valor", fill_value=0).reset_index()
     return resultado
 
-def remover_transferencias_entre_bancos(df_banco: pd.DataFrame) -> pd.DataFrame:
-    if df_banco.empty or not all(col in df_banco.columns for col in ["data", "valor", "tipo", "banco"]):
-        return df_banco
+def _parear_bancos_diferentes(debitos, creditos):
+    """Casa débitos e créditos de um mesmo grupo (valor e dia) sem juntar duas linhas do mesmo banco.
+
+    debitos/creditos: listas de (posição, banco). Sempre parte do banco com mais linhas pendentes,
+    o que dá o maior número de pares possível.
+    """
+    pendentes = {"D": {}, "C": {}}
+    for lado, linhas in (("D", debitos), ("C", creditos)):
+        for posicao, banco in linhas:
+            pendentes[lado].setdefault(banco, []).append(posicao)
+
+    def carga(banco):
+        return len(pendentes["D"].get(banco, [])) + len(pendentes["C"].get(banco, []))
+
+    pares = []
+    while pendentes["D"] and pendentes["C"]:
+        banco = max(sorted(set(pendentes["D"]) | set(pendentes["C"])), key=carga)
+        for lado, outro in (("D", "C"), ("C", "D")):
+            opcoes = [b for b in pendentes[outro] if b != banco] if banco in pendentes[lado] else []
+            if opcoes:
+                break
+        else:
+            break
+        parceiro = max(opcoes, key=carga)
+        par = {lado: pendentes[lado][banco].pop(0), outro: pendentes[outro][parceiro].pop(0)}
+        pares.append((par["D"], par["C"]))
+        for l, b in ((lado, banco), (outro, parceiro)):
+            if not pendentes[l][b]:
+                del pendentes[l][b]
+    return pares
+
+
+def _parear_transferencias(debitos, creditos, dia_debito):
+    """Pareia débitos (dia_debito) com créditos do mesmo valor no dia indicado, em bancos diferentes"""
+    chave_d = debitos["centavos"].to_numpy() * 100_000 + dia_debito
+    chave_c = creditos["centavos"].to_numpy() * 100_000 + creditos["dia"].to_numpy()
+    comuns = np.intersect1d(chave_d, chave_c)
+    if not len(comuns):
+        return []
+
+    debitos = debitos[np.isin(chave_d, comuns)].assign(chave=chave_d[np.isin(chave_d, comuns)])
+    creditos = creditos[np.isin(chave_c, comuns)].assign(chave=chave_c[np.isin(chave_c, comuns)])
+
+    # Caso comum (um débito e um crédito de bancos diferentes) resolvido sem laço em Python
+    contagem = pd.concat([debitos["chave"], creditos["chave"]]).value_counts()
+    simples = contagem.index[contagem == 2]
+    d_simples = debitos[debitos["chave"].isin(simples)].set_index("chave")
+    c_simples = creditos[creditos["chave"].isin(simples)].set_index("chave").reindex(d_simples.index)
+    diferentes = (d_simples["banco"] != c_simples["banco"]).to_numpy()
+    pares = list(zip(d_simples["posicao"].to_numpy()[diferentes], c_simples["posicao"].to_numpy()[diferentes]))
+
+    multiplos_d = debitos[~debitos["chave"].isin(simples)]
+    multiplos_c = creditos[~creditos["chave"].isin(simples)]
+    grupos_c = {chave: list(zip(g["posicao"], g["banco"])) for chave, g in multiplos_c.groupby("chave")}
+    for chave, g in multiplos_d.groupby("chave"):
+        pares.extend(_parear_bancos_diferentes(list(zip(g["posicao"], g["banco"])), grupos_c[chave]))
+    return pares
+
+
+def remover_transferencias_entre_bancos(df_banco: pd.DataFrame, defasagem_dias_uteis=0, retornar_pares=False):
+    """Tira do extrato as transferências entre contas da empresa: cada débito casa com no máximo um
+    crédito de mesmo valor, em outro banco, no mesmo dia (ou até defasagem_dias_uteis dias úteis depois).
+
+    Com retornar_pares=True devolve também os pares removidos (colunas _debito/_credito) para conferência.
+    """
+    colunas = set(df_banco.columns)
+    if df_banco.empty or not {"data", "tipo", "banco"} <= colunas or not colunas & {"valor", "centavos"}:
+        return (df_banco, pd.DataFrame()) if retornar_pares else df_banco
 
     df = df_banco.copy()
     df["data"] = pd.to_datetime(df["data"], errors="coerce", dayfirst=True)
     df = df.dropna(subset=["data"])
-    df["valor_abs"] = df["valor"].abs()
-    df["chave"] = df["data"].astype(str) + "_" + df["valor_abs"].astype(str)
 
-    creditos = df[df["tipo"] == "C"]
-    debitos = df[df["tipo"] == "D"]
-    chaves_transferencia = set(creditos["chave"]).intersection(set(debitos["chave"]))
+    if "centavos" in df.columns:
+        centavos = np.abs(df["centavos"].to_numpy(dtype=np.int64))
+        validos = np.ones(len(df), dtype=bool)
+    else:
+        valores = pd.to_numeric(df["valor"], errors="coerce")
+        centavos = np.rint(valores.abs().fillna(0).to_numpy() * 100).astype(np.int64)
+        validos = valores.notna().to_numpy()
+    chaves = pd.DataFrame({
+        "posicao": np.arange(len(df)),
+        "centavos": centavos,
+        "dia": df["data"].to_numpy().astype("datetime64[D]").astype(np.int64),
+        "banco": df["banco"].astype(str).to_numpy(),
+    })
+    debitos = chaves[validos & (df["tipo"] == "D").to_numpy()]
+    creditos = chaves[validos & (df["tipo"] == "C").to_numpy()]
+
+    pares = []
+    for defasagem in range(defasagem_dias_uteis + 1):
+        dia_debito = debitos["dia"].to_numpy()
+        if defasagem:
+            dia_debito = np.busday_offset(
+                dia_debito.astype("datetime64[D]"), defasagem, roll="forward"
+            ).astype(np.int64)
+        novos = _parear_transferencias(debitos, creditos, dia_debito)
+        if novos:
+            usados_d, usados_c = zip(*novos)
+            debitos = debitos[~debitos["posicao"].isin(usados_d)]
+            creditos = creditos[~creditos["posicao"].isin(usados_c)]
+            pares.extend(novos)
+
+    removidos = np.zeros(len(df), dtype=bool)
+    if pares:
+        removidos[[p for par in pares for p in par]] = True
+    df_filtrado = df[~removidos]
 
-    df_filtrado = df[~df["chave"].isin(chaves_transferencia)].drop(columns=["valor_abs", "chave"])
-    return df_filtrado
+    if not retornar_pares:
+        return df_filtrado
+    pos_d = [d for d, _ in pares]
+    pos_c = [c for _, c in pares]
+    pares_df = pd.concat([
+        df.iloc[pos_d].reset_index(drop=True).add_suffix("_debito"),
+        df.iloc[pos_c].reset_index(drop=True).add_suffix("_credito"),
+    ], axis=1)
+    return df_filtrado, pares_df
 
 
 def gerar_txt_a_partir_do_excel(caminho_depara, func_salvar=salvar_resultados):
@@ -131,7 +302,7 @@ def gerar_txt_a_partir_do_excel(caminho_depara, func_salvar=salvar_resultados):
                 desc = str(row["descricao"])
                 conta_atual = str(row["conta_debito"])
                 fornecedor = desc.split("-")[0].strip().lower()
-                fornecedor_normalizado = normalize_text(fornecedor)
+                fornecedor_normalizado = normalizar_texto(fornecedor)
                 conta_nova = mapa.get(fornecedor_normalizado)
                 if conta_nova and conta_nova != conta_atual:
                     df.at[i, "conta_debito"] = conta_nova
@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import time
+import cProfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from services.config import caminho_rastreamento, perfil_ativo
+from services.tarefas import verificar_cancelamento
+
+# Rastros mantidos na pasta; os mais antigos são apagados
+LIMITE_RASTROS = 200
+
+# Execução ativa de cada thread (a interface roda cada botão numa thread própria)
+_local = threading.local()
+
+
+class Rastreamento:
+    """Tempos e linhas de cada etapa de uma execução (importar relatórios, extrato, processar)"""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.inicio = datetime.now()
+        self.etapas = []
+        self.perfil = None
+        # Etapas abertas em cada thread; as de um pool ficam abaixo da etapa que as disparou
+        self._pilhas = threading.local()
+        # Etapas abertas ao mesmo tempo em várias threads: id e inclusão na lista juntos
+        self._trava = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    def _pilha(self):
+        if not hasattr(self._pilhas, "itens"):
+            self._pilhas.itens, self._pilhas.base = [], None
+        return self._pilhas.itens
+
+    def _definir_base(self, etapa_pai):
+        self._pilha()
+        self._pilhas.base = etapa_pai
+
+    def etapa_atual(self):
+        """Etapa aberta mais interna desta thread (None fora de qualquer etapa)"""
+        pilha = self._pilha()
+        return pilha[-1] if pilha else self._pilhas.base
+
+    @contextmanager
+    def etapa(self, nome, **detalhes):
+        pai = self.etapa_atual()
+        pilha = self._pilha()
+        registro = {
+            "id": None,
+            "pai": pai["id"] if pai else None,
+            "etapa": nome,
+            "nivel": pai["nivel"] + 1 if pai else 0,
+            "inicio_s": round(time.perf_counter() - self._t0, 4),
+            "duracao_s": None,
+            "linhas": None,
+            **detalhes,
+        }
+        with self._trava:
+            registro["id"] = len(self.etapas)
+            self.etapas.append(registro)
+        pilha.append(registro)
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        except Exception as e:
+            registro["erro"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            registro["duracao_s"] = round(time.perf_counter() - inicio, 4)
+            pilha.pop()
+
+    def duracao(self):
+        return sum(e["duracao_s"] or 0 for e in self.etapas if e["nivel"] == 0)
+
+    def resumo(self):
+        """Texto com uma linha por etapa (recuada pelo nível), tempo, % do total e linhas"""
+        total = self.duracao() or 1
+        filhas = {}
+        for e in self.etapas:
+            filhas.setdefault(e["pai"], []).append(e)
+
+        def em_ordem(pai):
+            for e in filhas.get(pai, []):
+                yield e
+                yield from em_ordem(e["id"])
+
+        linhas = []
+        for e in em_ordem(None):
+            nome = "  " * e["nivel"] + e["etapa"]
+            extra = e.get("arquivo") or e.get("banco") or ""
+            texto = f"{nome:<28} {e['duracao_s'] or 0:8.2f}s {100 * (e['duracao_s'] or 0) / total:5.1f}%"
+            if e["linhas"] is not None:
+                texto += f" {e['linhas']:>8} linhas"
+            if extra:
+                texto += f"  {extra}"
+            if "erro" in e:
+                texto += f"  ERRO {e['erro']}"
+            linhas.append(texto)
+        return "\n".join(linhas)
+
+    def como_dict(self):
+        return {
+            "execucao": self.nome,
+            "inicio": self.inicio.isoformat(timespec="seconds"),
+            "duracao_s": round(self.duracao(), 4),
+            "etapas": self.etapas,
+            "perfil": self.perfil,
+        }
+
+    def gravar(self, pasta=None, perfil=None):
+        pasta = pasta or caminho_rastreamento()
+        base = os.path.join(pasta, f"{self.inicio:%Y%m%d_%H%M%S}_{re.sub(r'[^0-9A-Za-z_-]+', '_', self.nome)}")
+        if perfil is not None:
+            self.perfil = base + ".prof"
+            perfil.dump_stats(self.perfil)
+        caminho = base + ".json"
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(self.como_dict(), f, ensure_ascii=False, indent=2, default=str)
+        _limpar_rastros(pasta)
+        return caminho
+
+
+def _limpar_rastros(pasta, limite=LIMITE_RASTROS):
+    rastros = sorted(nome for nome in os.listdir(pasta) if nome.endswith(".json"))
+    for nome in rastros[:max(0, len(rastros) - limite)]:
+        for extensao in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(pasta, nome[:-5] + extensao))
+            except OSError:
+                pass
+
+
+def rastreamento_atual():
+    return getattr(_local, "atual", None)
+
+
+@contextmanager
+def rastrear(nome, pasta=None):
+    """Abre uma execução rastreada nesta thread e grava o rastro (JSON) ao sair.
+
+    Dentro de outra execução vira só mais uma etapa dela. Com HMPX_PROFILE=1 a execução
+    roda sob o cProfile e o .prof fica ao lado do JSON (abrir com python -m pstats).
+    """
+    atual = rastreamento_atual()
+    if atual is not None:
+        with atual.etapa(nome):
+            yield atual
+        return
+
+    rastro = Rastreamento(nome)
+    perfil = cProfile.Profile() if perfil_ativo() else None
+    _local.atual = rastro
+    try:
+        if perfil is not None:
+            perfil.enable()
+        with rastro.etapa(nome):
+            yield rastro
+    finally:
+        if perfil is not None:
+            perfil.disable()
+        _local.atual = None
+        try:
+            caminho = rastro.gravar(pasta, perfil)
+            print(f"[RASTREAMENTO] {nome}: {rastro.duracao():.2f}s, rastro em {caminho}")
+        except OSError as e:
+            print(f"[RASTREAMENTO] Não foi possível gravar o rastro: {e}")
+
+
+@contextmanager
+def vincular(rastro, etapa_pai=None):
+    """Faz as etapas desta thread (ex: uma tarefa de um pool) entrarem na execução rastro, abaixo de etapa_pai"""
+    anterior = rastreamento_atual()
+    if rastro is not None:
+        rastro._definir_base(etapa_pai)
+    _local.atual = rastro
+    try:
+        yield rastro
+    finally:
+        _local.atual = anterior
+
+
+@contextmanager
+def etapa(nome, **detalhes):
+    """Mede um trecho dentro da execução ativa; fora de uma execução não registra nada.
+
+    O registro devolvido aceita informações extras, ex: registro["linhas"] = len(df).
+    O início de cada etapa é também um ponto de cancelamento da tarefa em execução.
+    """
+    verificar_cancelamento()
+    atual = rastreamento_atual()
+    if atual is None:
+        yield {}
+        return
+    with atual.etapa(nome, **detalhes) as registro:
+        yield registro
@@ -0,0 +1,200 @@
+import os
+import re
+import threading
+import pandas as pd
+from contextlib import contextmanager
+from openpyxl import Workbook
+
+from services.tarefas import verificar_cancelamento
+
+# Linhas convertidas por vez ao gravar; limita a memória em resultados longos
+TAMANHO_LOTE = 10_000
+
+FORMATO_PADRAO = "xlsx"
+
+# Caracteres não aceitos em nome de aba do Excel (e o nome tem no máximo 31)
+_INVALIDOS_ABA = re.compile(r"[\[\]:*?/\\]")
+
+
+def em_lotes(dados, tamanho=TAMANHO_LOTE):
+    """Aceita um DataFrame (fatiado aqui) ou um iterável de lotes (DataFrames ou listas de dicts).
+
+    Cada lote é também um ponto de cancelamento da tarefa em execução.
+    """
+    if isinstance(dados, pd.DataFrame):
+        if dados.empty:
+            yield dados
+        for inicio in range(0, len(dados), tamanho):
+            verificar_cancelamento()
+            yield dados.iloc[inicio:inicio + tamanho]
+    else:
+        for lote in dados:
+            verificar_cancelamento()
+            yield pd.DataFrame(lote)
+
+
+@contextmanager
+def gravacao_atomica(caminho):
+    """Nome temporário para gravar caminho; só vira caminho (os.replace) se a gravação terminar.
+
+    Cancelamento ou erro no meio apagam o temporário, sem deixar arquivo truncado no destino.
+    """
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield temporario
+        os.replace(temporario, caminho)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def arquivos_em_conjunto():
+    """Lista dos arquivos gravados juntos (ex: planilha e TXT de uma conciliação).
+
+    Se a gravação for cancelada ou falhar no meio, os que já estavam prontos são apagados.
+    """
+    gravados = []
+    try:
+        yield gravados
+    except BaseException:
+        for caminho in gravados:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+        raise
+
+
+def _linhas(df):
+    # NaN/NaT viram célula vazia
+    valores = df.astype(object)
+    return valores.where(df.notna(), None).itertuples(index=False, name=None)
+
+
+def _nome_aba(nome, usados):
+    nome = _INVALIDOS_ABA.sub("_", str(nome))[:31] or "Planilha"
+    base, n = nome, 2
+    while nome.lower() in usados:
+        sufixo = f"_{n}"
+        nome = base[:31 - len(sufixo)] + sufixo
+        n += 1
+    usados.add(nome.lower())
+    return nome
+
+
+def _descartar_abas(wb):
+    """Fecha as abas de uma pasta write-only que não vai ser gravada e apaga os temporários delas"""
+    for ws in wb.worksheets:
+        try:
+            ws.close()
+            ws._writer.cleanup()
+        except Exception:
+            pass
+
+
+def gravar_xlsx(caminho, planilhas):
+    """Grava {nome da aba: dados} num único arquivo, numa só passada e sem montar a planilha em memória"""
+    wb = Workbook(write_only=True)
+    usados = set()
+    try:
+        for nome, dados in planilhas.items():
+            ws = wb.create_sheet(title=_nome_aba(nome, usados))
+            cabecalho = False
+            for lote in em_lotes(dados):
+                if not cabecalho:
+                    ws.append([str(coluna) for coluna in lote.columns])
+                    cabecalho = True
+                for linha in _linhas(lote):
+                    ws.append(linha)
+    except BaseException:
+        _descartar_abas(wb)
+        raise
+    if not usados:
+        wb.create_sheet(title="Planilha")
+    with gravacao_atomica(caminho) as temporario:
+        wb.save(temporario)
+    return caminho
+
+
+def _tipos_consistentes(df):
+    """Colunas de texto com tipos misturados (ex: contas como texto e número) vão como texto"""
+    df = df.copy(deep=False)
+    for coluna in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[coluna], skipna=True).startswith("mixed"):
+            df[coluna] = df[coluna].where(df[coluna].isna(), df[coluna].astype(str))
+    return df
+
+
+def _esquema_parquet(esquema):
+    """Colunas só com vazios (tipo null) vão como texto, para caberem os valores que vierem depois"""
+    import pyarrow as pa
+
+    campos = [campo.with_type(pa.string()) if pa.types.is_null(campo.type) else campo for campo in esquema]
+    return pa.schema(campos, metadata=esquema.metadata)
+
+
+def gravar_parquet(caminho, dados):
+    """O esquema sai do DataFrame inteiro (com lotes, do primeiro) e cada lote é convertido a ele"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = None
+    if isinstance(dados, pd.DataFrame) and not dados.empty:
+        esquema = _esquema_parquet(pa.Schema.from_pandas(_tipos_consistentes(dados), preserve_index=False))
+    with gravacao_atomica(caminho) as temporario:
+        escritor = None
+        try:
+            for lote in em_lotes(dados):
+                tabela = pa.Table.from_pandas(_tipos_consistentes(lote), preserve_index=False)
+                if escritor is None:
+                    escritor = pq.ParquetWriter(temporario, esquema or _esquema_parquet(tabela.schema))
+                escritor.write_table(tabela.cast(escritor.schema))
+        finally:
+            if escritor is not None:
+                escritor.close()
+    return caminho
+
+
+def gravar_csv(caminho, dados):
+    primeiro = True
+    with gravacao_atomica(caminho) as temporario, open(temporario, "w", encoding="utf-8", newline="") as f:
+        for lote in em_lotes(dados):
+            lote.to_csv(f, sep=";", index=False, header=primeiro)
+            primeiro = False
+    return caminho
+
+
+ESCRITORES = {
+    "xlsx": gravar_xlsx,
+    "parquet": gravar_parquet,
+    "csv": gravar_csv,
+}
+
+
+def gravar_resultados(caminho_base, resultados, formatos=None, formato_padrao=FORMATO_PADRAO):
+    """Grava {nome: dados} escolhendo o formato de cada resultado (formatos[nome] ou o padrão).
+
+    Os resultados em xlsx saem juntos em caminho_base.xlsx, uma aba por resultado; parquet e csv
+    geram um arquivo por resultado (caminho_base_<nome>.<formato>). Devolve os caminhos gravados;
+    cancelada no meio, não deixa nenhum deles.
+    """
+    formatos = formatos or {}
+    por_formato = {}
+    for nome, dados in resultados.items():
+        formato = formatos.get(nome, formato_padrao)
+        if formato not in ESCRITORES:
+            raise ValueError(f"Formato de saída desconhecido: {formato} (use {', '.join(ESCRITORES)})")
+        por_formato.setdefault(formato, {})[nome] = dados
+
+    with arquivos_em_conjunto() as caminhos:
+        if "xlsx" in por_formato:
+            caminhos.append(gravar_xlsx(caminho_base + ".xlsx", por_formato.pop("xlsx")))
+        for formato, grupo in por_formato.items():
+            for nome, dados in grupo.items():
+                caminho = f"{caminho_base}.{formato}" if len(resultados) == 1 else f"{caminho_base}_{nome}.{formato}"
+                caminhos.append(ESCRITORES[formato](caminho, dados))
+    return caminhos
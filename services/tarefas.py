@@ -0,0 +1,138 @@
+import queue
+import threading
+import traceback
+from contextlib import contextmanager
+
+
+class Cancelado(Exception):
+    """A tarefa foi cancelada pelo usuário"""
+
+
+class Tarefa:
+    """Um trabalho enviado ao GerenciadorTarefas, com o seu pedido de cancelamento e os avisos de progresso"""
+
+    def __init__(self, gerenciador, nome, funcao, ao_concluir=None, ao_falhar=None, ao_cancelar=None, ao_progredir=None):
+        self.nome = nome
+        self.funcao = funcao
+        self.ao_concluir = ao_concluir
+        self.ao_falhar = ao_falhar
+        self.ao_cancelar = ao_cancelar
+        self.ao_progredir = ao_progredir
+        self._gerenciador = gerenciador
+        self._cancelada = threading.Event()
+
+    @property
+    def cancelada(self):
+        return self._cancelada.is_set()
+
+    def cancelar(self):
+        self._cancelada.set()
+
+    def verificar(self):
+        if self._cancelada.is_set():
+            raise Cancelado(f"{self.nome} cancelada")
+
+    def progresso(self, texto, fracao=None):
+        self._gerenciador._eventos.put(("progresso", self, (texto, fracao)))
+
+
+# Tarefa em execução em cada thread (as threads de um pool recebem a de quem as criou)
+_local = threading.local()
+
+
+def tarefa_atual():
+    return getattr(_local, "tarefa", None)
+
+
+@contextmanager
+def vincular_tarefa(tarefa):
+    anterior = tarefa_atual()
+    _local.tarefa = tarefa
+    try:
+        yield tarefa
+    finally:
+        _local.tarefa = anterior
+
+
+def verificar_cancelamento():
+    """Ponto de parada: levanta Cancelado se a tarefa desta thread foi cancelada (fora de tarefa não faz nada)"""
+    tarefa = tarefa_atual()
+    if tarefa is not None:
+        tarefa.verificar()
+
+
+def informar_progresso(texto, fracao=None):
+    tarefa = tarefa_atual()
+    if tarefa is not None:
+        tarefa.progresso(texto, fracao)
+
+
+class GerenciadorTarefas:
+    """Fila de tarefas executadas uma de cada vez numa thread de fundo.
+
+    Nada aqui chama a interface: conclusão, erro, cancelamento e progresso viram eventos numa
+    fila, e os callbacks só rodam em processar_eventos(), que a tela chama pelo after() do Tk.
+    """
+
+    def __init__(self):
+        self._fila = queue.Queue()
+        self._eventos = queue.Queue()
+        self._trava = threading.Lock()
+        self._pendentes = []
+        self._thread = None
+
+    def enviar(self, nome, funcao, **callbacks):
+        """Enfileira funcao(tarefa); devolve None se já houver uma tarefa com esse nome na fila"""
+        with self._trava:
+            if any(t.nome == nome for t in self._pendentes):
+                return None
+            tarefa = Tarefa(self, nome, funcao, **callbacks)
+            self._pendentes.append(tarefa)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name="tarefas", daemon=True)
+                self._thread.start()
+        self._fila.put(tarefa)
+        return tarefa
+
+    def ocupado(self, nome=None):
+        with self._trava:
+            return any(nome is None or t.nome == nome for t in self._pendentes)
+
+    def cancelar(self):
+        """Pede o cancelamento da tarefa em execução e descarta as que ainda não começaram"""
+        with self._trava:
+            for tarefa in self._pendentes:
+                tarefa.cancelar()
+
+    def _executar(self):
+        while True:
+            tarefa = self._fila.get()
+            try:
+                tarefa.verificar()
+                with vincular_tarefa(tarefa):
+                    resultado = tarefa.funcao(tarefa)
+                evento = ("concluida", tarefa, resultado)
+            except Cancelado:
+                evento = ("cancelada", tarefa, None)
+            except Exception as e:
+                traceback.print_exc()
+                evento = ("erro", tarefa, e)
+            with self._trava:
+                self._pendentes.remove(tarefa)
+            self._eventos.put(evento)
+
+    def processar_eventos(self):
+        """Executa os callbacks dos eventos acumulados; chamar só da thread da interface"""
+        while True:
+            try:
+                tipo, tarefa, dados = self._eventos.get_nowait()
+            except queue.Empty:
+                return
+            if tipo == "progresso" and tarefa.ao_progredir:
+                tarefa.ao_progredir(*dados)
+            elif tipo == "concluida" and tarefa.ao_concluir:
+                tarefa.ao_concluir(dados)
+            elif tipo == "erro" and tarefa.ao_falhar:
+                tarefa.ao_falhar(dados)
+            elif tipo == "cancelada" and tarefa.ao_cancelar:
+                tarefa.ao_cancelar()
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# Valor em texto, já sem espaços: sinal, "R$", número e sufixo C/D, em qualquer ordem usada pelos
+# bancos e relatórios. Ex: "R$-1.234,56", "1.234,56D", "-1234.56", "1.234,56-"
+PADRAO_VALOR = (
+    r"^(?P<sinal>[-+])?(?:R\$)?(?P<sinal_moeda>[-+])?(?P<numero>[\d.,]*\d[\d.,]*)"
+    r"(?P<sufixo>[CD])?(?P<sinal_final>-)?$"
+)
+
+
+def _numero_com_ponto(numero):
+    """Número com ponto decimal: "1.234,56" -> "1234.56"; só ponto vale como milhar se vier seguido de 3+ dígitos"""
+    tem_virgula = numero.str.contains(",", regex=False, na=False)
+    milhar = ~tem_virgula & numero.str.rsplit(".", n=1).str[-1].str.len().gt(2)
+    numero = numero.mask(tem_virgula, numero.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return numero.mask(milhar, numero.str.replace(".", "", regex=False))
+
+
+def _reais_de_texto(textos):
+    textos = textos.astype(str)
+    partes = textos.str.replace(r"\s+", "", regex=True).str.upper().str.extract(PADRAO_VALOR)
+    reais = pd.to_numeric(_numero_com_ponto(partes["numero"]), errors="coerce")
+    negativo = (
+        partes["sinal"].eq("-") | partes["sinal_moeda"].eq("-") | partes["sinal_final"].eq("-") | partes["sufixo"].eq("D")
+    )
+    return reais.where(~negativo, -reais)
+
+
+def texto_para_centavos(serie):
+    """Valores monetários (texto no formato brasileiro ou números) em centavos, numa operação por coluna.
+
+    Aceita "1.234,56", "R$ 1.234,56", "-1.234,56", "1.234,56 D" (D = negativo, C = positivo) e
+    também ponto decimal ("1234.56"). Devolve Int64: vazio ou inválido fica <NA>.
+    """
+    serie = pd.Series(serie)
+    if pd.api.types.is_numeric_dtype(serie):
+        reais = serie.astype(float)
+    else:
+        reais = pd.Series(np.nan, index=serie.index)
+        preenchidos = serie.notna()
+        if pd.api.types.infer_dtype(serie, skipna=True) == "string":
+            texto = preenchidos
+        else:
+            # Números soltos numa coluna de texto (ex: lida do Excel) não passam pelo texto
+            numeros = serie.map(lambda v: isinstance(v, (int, float, np.number)) and not isinstance(v, bool))
+            reais[numeros] = pd.to_numeric(serie[numeros], errors="coerce")
+            texto = preenchidos & ~numeros
+        if texto.any():
+            reais[texto] = _reais_de_texto(serie[texto]).to_numpy()
+    centavos = np.rint(reais.to_numpy(dtype=float) * 100)
+    return pd.Series(pd.array(np.where(np.isfinite(centavos), centavos, np.nan), dtype="Int64"), index=serie.index)
+
+
+def valores_em_centavos(df, coluna="valor", destino="centavos"):
+    """Troca a coluna de valores em texto pela coluna em centavos (int64), na mesma posição.
+
+    As linhas com valor inválido saem, como os parsers faziam ao ignorar a linha.
+    """
+    if df.empty or coluna not in df.columns:
+        return df
+    centavos = texto_para_centavos(df[coluna])
+    df = df.assign(**{coluna: centavos}).rename(columns={coluna: destino})
+    validos = centavos.notna().to_numpy()
+    if not validos.all():
+        print(f"[VALORES] {int((~validos).sum())} linha(s) com valor inválido ignorada(s)")
+        df = df[validos].reset_index(drop=True)
+    df[destino] = df[destino].astype(np.int64)
+    return df
+
+
+def tipo_pelo_sinal(centavos):
+    """C para valores positivos, D para zero ou negativos"""
+    return np.where(np.asarray(centavos) > 0, "C", "D")
@@ -0,0 +1,29 @@
+from services.categorias import Categorizador
+from services.pipeline import SessaoConciliacao
+
+REGRAS = [
+    {"categoria": "Pix", "termos": ["pix"]},
+    {"categoria": "TED", "palavras": ["ted"]},
+    {"categoria": "Tarifa", "termos": ["tarifa"]},
+]
+
+
+def test_contagem_acumula_entre_chamadas():
+    categorizador = Categorizador(REGRAS, padrao="Outros")
+
+    primeira = categorizador.categorizar(["PIX recebido", "Tarifa mensal", "pix enviado", "conteudo"])
+    segunda = categorizador.categorizar(["TED 123", "pix", None])
+
+    assert primeira.tolist() == ["Pix", "Tarifa", "Pix", "Outros"]
+    assert segunda.tolist() == ["TED", "Pix", "Outros"]
+    assert categorizador.contagem == {"Pix": 3, "Tarifa": 1, "TED": 1, "Outros": 2}
+
+
+def test_contagem_e_de_cada_sessao():
+    sessao = SessaoConciliacao("teste", config={"parser": "imperio"})
+    sessao.categorizador.categorizar(["pix", "boleto"])
+    assert sessao.contagem_categorias() == {"Pix": 1, "Boleto": 1}
+
+    sessao.resetar()
+    assert sessao.contagem_categorias() == {}
+    assert SessaoConciliacao("outra", config={"parser": "imperio"}).contagem_categorias() == {}
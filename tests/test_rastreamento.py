@@ -0,0 +1,23 @@
+import threading
+
+from services.rastreamento import Rastreamento
+
+
+def test_etapas_abertas_em_varias_threads_tem_ids_unicos():
+    rastro = Rastreamento("teste")
+
+    def abrir():
+        for _ in range(500):
+            with rastro.etapa("arquivo"):
+                with rastro.etapa("bloco"):
+                    pass
+
+    threads = [threading.Thread(target=abrir) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    por_id = {e["id"]: e for e in rastro.etapas}
+    assert sorted(por_id) == list(range(len(rastro.etapas)))
+    assert all(por_id[e["pai"]]["etapa"] == "arquivo" for e in rastro.etapas if e["etapa"] == "bloco")
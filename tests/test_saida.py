@@ -0,0 +1,29 @@
+import pandas as pd
+
+from services.saida import TAMANHO_LOTE, gravar_parquet
+
+
+def test_parquet_coluna_vazia_no_primeiro_lote(tmp_path):
+    caminho = str(tmp_path / "lotes.parquet")
+    lotes = [{"a": [1, 2, 3], "b": [None] * 3}, {"a": [4, 5, 6], "b": ["x", "y", "z"]}]
+
+    gravar_parquet(caminho, lotes)
+
+    lido = pd.read_parquet(caminho)
+    assert lido["b"].tolist() == [None, None, None, "x", "y", "z"]
+
+
+def test_parquet_dataframe_com_valor_so_depois_do_primeiro_lote(tmp_path):
+    caminho = str(tmp_path / "df.parquet")
+    df = pd.DataFrame({
+        "a": range(TAMANHO_LOTE + 2),
+        "b": [None] * TAMANHO_LOTE + ["x", "y"],
+        "c": [None] * TAMANHO_LOTE + [1.5, 2.5],
+    })
+
+    gravar_parquet(caminho, df)
+
+    lido = pd.read_parquet(caminho)
+    assert len(lido) == len(df)
+    assert lido["b"].tail(2).tolist() == ["x", "y"]
+    assert lido["c"].tail(2).tolist() == [1.5, 2.5]